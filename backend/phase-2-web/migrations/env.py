@@ -0,0 +1,65 @@
+import asyncio
+from logging.config import fileConfig
+
+from alembic import context
+from sqlalchemy.ext.asyncio import create_async_engine
+from sqlmodel import SQLModel
+
+import src.models.schemas  # noqa: F401  registers the tables on SQLModel.metadata
+from src.config import settings
+from src.db import build_db_url
+
+config = context.config
+if config.config_file_name is not None:
+    fileConfig(config.config_file_name)
+
+target_metadata = SQLModel.metadata
+
+
+# Search objects managed by raw DDL rather than the metadata
+UNMANAGED_PREFIXES = ("tasks_fts", "search_vector", "ix_tasks_search_vector", "ix_tasks_title_trgm")
+
+
+def include_object(obj, name, type_, reflected, compare_to) -> bool:
+    return not (reflected and name and name.startswith(UNMANAGED_PREFIXES))
+
+
+def get_url() -> str:
+    return config.get_main_option("sqlalchemy.url") or build_db_url(settings.DATABASE_URL)
+
+
+def run_migrations_offline() -> None:
+    """Emit migration SQL without a database connection"""
+    context.configure(
+        url=get_url(),
+        target_metadata=target_metadata,
+        include_object=include_object,
+        literal_binds=True,
+        dialect_opts={"paramstyle": "named"},
+    )
+    with context.begin_transaction():
+        context.run_migrations()
+
+
+def do_run_migrations(connection) -> None:
+    context.configure(
+        connection=connection,
+        target_metadata=target_metadata,
+        include_object=include_object,
+        render_as_batch=connection.dialect.name == "sqlite",
+    )
+    with context.begin_transaction():
+        context.run_migrations()
+
+
+async def run_migrations_online() -> None:
+    engine = create_async_engine(get_url())
+    async with engine.connect() as connection:
+        await connection.run_sync(do_run_migrations)
+    await engine.dispose()
+
+
+if context.is_offline_mode():
+    run_migrations_offline()
+else:
+    asyncio.run(run_migrations_online())
@@ -0,0 +1,24 @@
+"""task keyset index
+
+Revision ID: 0002
+Revises: 0001
+Create Date: 2026-10-17 15:04:01.000000
+
+(user_id, created_at, id) index behind keyset pagination of GET /tasks.
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+revision = '0002'
+down_revision = '0001'
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    op.create_index('ix_tasks_user_created_id', 'tasks', ['user_id', 'created_at', 'id'], unique=False)
+
+
+def downgrade() -> None:
+    op.drop_index('ix_tasks_user_created_id', table_name='tasks')
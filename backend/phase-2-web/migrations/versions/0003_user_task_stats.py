@@ -0,0 +1,64 @@
+"""user task stats
+
+Revision ID: 0003
+Revises: 0002
+Create Date: 2026-10-17 15:04:02.000000
+
+Per-user task counters, backfilled from the existing tasks.
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+revision = '0003'
+down_revision = '0002'
+branch_labels = None
+depends_on = None
+
+BACKFILL = """
+INSERT INTO user_task_stats (
+    user_id, total, completed, low, medium, high,
+    pending_low, pending_medium, pending_high, pending_with_due,
+    last_task_created, updated_at
+)
+SELECT
+    user_id,
+    COUNT(*),
+    SUM(CASE WHEN completed THEN 1 ELSE 0 END),
+    SUM(CASE WHEN priority = 'low' THEN 1 ELSE 0 END),
+    SUM(CASE WHEN priority = 'medium' THEN 1 ELSE 0 END),
+    SUM(CASE WHEN priority = 'high' THEN 1 ELSE 0 END),
+    SUM(CASE WHEN NOT completed AND priority = 'low' THEN 1 ELSE 0 END),
+    SUM(CASE WHEN NOT completed AND priority = 'medium' THEN 1 ELSE 0 END),
+    SUM(CASE WHEN NOT completed AND priority = 'high' THEN 1 ELSE 0 END),
+    SUM(CASE WHEN NOT completed AND due_date IS NOT NULL THEN 1 ELSE 0 END),
+    MAX(created_at),
+    CURRENT_TIMESTAMP
+FROM tasks
+WHERE deleted_at IS NULL
+GROUP BY user_id
+"""
+
+
+def upgrade() -> None:
+    op.create_table('user_task_stats',
+    sa.Column('user_id', sa.Uuid(), nullable=False),
+    sa.Column('total', sa.Integer(), nullable=False),
+    sa.Column('completed', sa.Integer(), nullable=False),
+    sa.Column('low', sa.Integer(), nullable=False),
+    sa.Column('medium', sa.Integer(), nullable=False),
+    sa.Column('high', sa.Integer(), nullable=False),
+    sa.Column('pending_low', sa.Integer(), nullable=False),
+    sa.Column('pending_medium', sa.Integer(), nullable=False),
+    sa.Column('pending_high', sa.Integer(), nullable=False),
+    sa.Column('pending_with_due', sa.Integer(), nullable=False),
+    sa.Column('last_task_created', sa.DateTime(), nullable=True),
+    sa.Column('updated_at', sa.DateTime(), nullable=False),
+    sa.ForeignKeyConstraint(['user_id'], ['users.id'], ),
+    sa.PrimaryKeyConstraint('user_id')
+    )
+    op.execute(BACKFILL)
+
+
+def downgrade() -> None:
+    op.drop_table('user_task_stats')
@@ -0,0 +1,101 @@
+"""session token jti
+
+Revision ID: 0004
+Revises: 0003
+Create Date: 2026-10-17 15:04:03.000000
+
+Replace the stored access/refresh tokens with their indexed jti claims.
+The jti of each stored token is read from its payload. Tokens without a
+readable jti, or whose jti repeats (older tokens derived it from a
+32-bit hash), get a fresh placeholder and their session is revoked, so
+those users sign in again. Offline (--sql) runs cannot read the tokens,
+so they revoke every session instead.
+"""
+import base64
+import json
+import uuid
+from datetime import datetime
+
+from alembic import context, op
+import sqlalchemy as sa
+import sqlmodel
+
+
+revision = '0004'
+down_revision = '0003'
+branch_labels = None
+depends_on = None
+
+sessions = sa.table(
+    'sessions',
+    sa.column('id', sa.Uuid()),
+    sa.column('access_token', sa.String()),
+    sa.column('refresh_token', sa.String()),
+    sa.column('access_jti', sa.String()),
+    sa.column('refresh_jti', sa.String()),
+    sa.column('revoked_at', sa.DateTime()),
+)
+
+
+def _token_jti(token: str | None) -> str | None:
+    try:
+        segment = token.split('.')[1]
+        payload = json.loads(base64.urlsafe_b64decode(segment + '=' * (-len(segment) % 4)))
+        jti = payload['jti']
+    except (AttributeError, IndexError, KeyError, TypeError, ValueError):
+        return None
+    return jti if isinstance(jti, str) and len(jti) <= 36 else None
+
+
+def _backfill_jti(bind) -> None:
+    seen: set[str] = set()
+    now = datetime.utcnow()
+    rows = bind.execute(
+        sa.select(sessions.c.id, sessions.c.access_token, sessions.c.refresh_token, sessions.c.revoked_at)
+    ).all()
+    for row in rows:
+        values = {}
+        for column, token in (('access_jti', row.access_token), ('refresh_jti', row.refresh_token)):
+            jti = _token_jti(token)
+            if jti is None or jti in seen:
+                jti = str(uuid.uuid4())
+                values['revoked_at'] = row.revoked_at or now
+            seen.add(jti)
+            values[column] = jti
+        bind.execute(sessions.update().where(sessions.c.id == row.id).values(**values))
+
+
+def upgrade() -> None:
+    op.add_column('sessions', sa.Column('access_jti', sqlmodel.sql.sqltypes.AutoString(length=36), nullable=True))
+    op.add_column('sessions', sa.Column('refresh_jti', sqlmodel.sql.sqltypes.AutoString(length=36), nullable=True))
+
+    if context.is_offline_mode():
+        op.execute(
+            "UPDATE sessions SET access_jti = gen_random_uuid()::text, "
+            "refresh_jti = gen_random_uuid()::text, "
+            "revoked_at = coalesce(revoked_at, now())"
+        )
+    else:
+        _backfill_jti(op.get_bind())
+
+    with op.batch_alter_table('sessions') as batch_op:
+        batch_op.alter_column('access_jti', existing_type=sqlmodel.sql.sqltypes.AutoString(length=36), nullable=False)
+        batch_op.alter_column('refresh_jti', existing_type=sqlmodel.sql.sqltypes.AutoString(length=36), nullable=False)
+        batch_op.drop_column('access_token')
+        batch_op.drop_column('refresh_token')
+    op.create_index(op.f('ix_sessions_access_jti'), 'sessions', ['access_jti'], unique=True)
+    op.create_index(op.f('ix_sessions_refresh_jti'), 'sessions', ['refresh_jti'], unique=True)
+
+
+def downgrade() -> None:
+    # The raw tokens are gone: restore the columns empty and revoke every session
+    op.drop_index(op.f('ix_sessions_refresh_jti'), table_name='sessions')
+    op.drop_index(op.f('ix_sessions_access_jti'), table_name='sessions')
+    with op.batch_alter_table('sessions') as batch_op:
+        batch_op.add_column(sa.Column('access_token', sqlmodel.sql.sqltypes.AutoString(length=1024), nullable=False, server_default=''))
+        batch_op.add_column(sa.Column('refresh_token', sqlmodel.sql.sqltypes.AutoString(length=1024), nullable=False, server_default=''))
+        batch_op.drop_column('refresh_jti')
+        batch_op.drop_column('access_jti')
+    op.execute(
+        sessions.update().where(sessions.c.revoked_at.is_(None)).values(revoked_at=datetime.utcnow())
+    )
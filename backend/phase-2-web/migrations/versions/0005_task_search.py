@@ -0,0 +1,81 @@
+"""task search
+
+Revision ID: 0005
+Revises: 0004
+Create Date: 2026-10-17 15:04:05.000000
+
+Full-text search over task title/description.
+PostgreSQL: generated, weighted tsvector column with a GIN index, plus a
+trigram index on title for type-ahead suggestions.
+SQLite: external-content FTS5 table kept in sync by triggers, rebuilt
+from the existing rows.
+
+The DDL is copied here rather than imported so this revision does not
+change when the models do.
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+revision = '0005'
+down_revision = '0004'
+branch_labels = None
+depends_on = None
+
+UPGRADE = {
+    "postgresql": [
+        """ALTER TABLE tasks ADD COLUMN IF NOT EXISTS search_vector tsvector
+        GENERATED ALWAYS AS (
+            setweight(to_tsvector('english', coalesce(title, '')), 'A') ||
+            setweight(to_tsvector('english', coalesce(description, '')), 'B')
+        ) STORED""",
+        "CREATE INDEX IF NOT EXISTS ix_tasks_search_vector ON tasks USING GIN (search_vector)",
+        "CREATE EXTENSION IF NOT EXISTS pg_trgm",
+        "CREATE INDEX IF NOT EXISTS ix_tasks_title_trgm ON tasks USING GIN (title gin_trgm_ops)",
+    ],
+    "sqlite": [
+        """CREATE VIRTUAL TABLE IF NOT EXISTS tasks_fts USING fts5(
+            title, description, content='tasks', content_rowid='rowid'
+        )""",
+        """CREATE TRIGGER IF NOT EXISTS tasks_fts_insert AFTER INSERT ON tasks BEGIN
+            INSERT INTO tasks_fts(rowid, title, description)
+            VALUES (new.rowid, new.title, new.description);
+        END""",
+        """CREATE TRIGGER IF NOT EXISTS tasks_fts_delete AFTER DELETE ON tasks BEGIN
+            INSERT INTO tasks_fts(tasks_fts, rowid, title, description)
+            VALUES ('delete', old.rowid, old.title, old.description);
+        END""",
+        """CREATE TRIGGER IF NOT EXISTS tasks_fts_update AFTER UPDATE OF title, description ON tasks
+        BEGIN
+            INSERT INTO tasks_fts(tasks_fts, rowid, title, description)
+            VALUES ('delete', old.rowid, old.title, old.description);
+            INSERT INTO tasks_fts(rowid, title, description)
+            VALUES (new.rowid, new.title, new.description);
+        END""",
+        "INSERT INTO tasks_fts(tasks_fts) VALUES ('rebuild')",
+    ],
+}
+
+DOWNGRADE = {
+    "postgresql": [
+        "DROP INDEX IF EXISTS ix_tasks_title_trgm",
+        "DROP INDEX IF EXISTS ix_tasks_search_vector",
+        "ALTER TABLE tasks DROP COLUMN IF EXISTS search_vector",
+    ],
+    "sqlite": [
+        "DROP TRIGGER IF EXISTS tasks_fts_update",
+        "DROP TRIGGER IF EXISTS tasks_fts_delete",
+        "DROP TRIGGER IF EXISTS tasks_fts_insert",
+        "DROP TABLE IF EXISTS tasks_fts",
+    ],
+}
+
+
+def upgrade() -> None:
+    for statement in UPGRADE.get(op.get_bind().dialect.name, []):
+        op.execute(statement)
+
+
+def downgrade() -> None:
+    for statement in DOWNGRADE.get(op.get_bind().dialect.name, []):
+        op.execute(statement)
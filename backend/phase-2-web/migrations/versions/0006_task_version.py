@@ -0,0 +1,28 @@
+"""task version
+
+Revision ID: 0006
+Revises: 0005
+Create Date: 2026-10-17 15:04:06.000000
+
+Per-task version counter behind ETags. Existing rows start at 1.
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+revision = '0006'
+down_revision = '0005'
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    op.add_column('tasks', sa.Column('version', sa.Integer(), nullable=False, server_default='1'))
+    if op.get_bind().dialect.name == "postgresql":
+        # The model supplies the value; SQLite keeps the default rather than
+        # rebuilding the table, which would drop the search triggers
+        op.alter_column('tasks', 'version', server_default=None)
+
+
+def downgrade() -> None:
+    op.drop_column('tasks', 'version')
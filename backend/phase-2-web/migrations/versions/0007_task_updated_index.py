@@ -0,0 +1,24 @@
+"""task updated index
+
+Revision ID: 0007
+Revises: 0006
+Create Date: 2026-10-17 15:04:07.000000
+
+(user_id, updated_at, id) keyset index behind delta sync.
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+revision = '0007'
+down_revision = '0006'
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    op.create_index('ix_tasks_user_updated_id', 'tasks', ['user_id', 'updated_at', 'id'], unique=False)
+
+
+def downgrade() -> None:
+    op.drop_index('ix_tasks_user_updated_id', table_name='tasks')
@@ -0,0 +1,68 @@
+"""task query indexes
+
+Revision ID: 0008
+Revises: 0007
+Create Date: 2026-10-17 15:04:10.000000
+
+Composite and partial indexes shaped after the hot task queries. They
+replace the standalone user_id index and (user_id, created_at, id).
+On PostgreSQL the indexes are built CONCURRENTLY outside the migration
+transaction so writes are not blocked.
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+revision = '0008'
+down_revision = '0007'
+branch_labels = None
+depends_on = None
+
+ACTIVE = sa.text('deleted_at IS NULL')
+PENDING = sa.text('completed IS false AND deleted_at IS NULL')
+
+
+def _index_options() -> dict:
+    if op.get_bind().dialect.name == "postgresql":
+        return {"postgresql_concurrently": True, "if_not_exists": True}
+    return {"if_not_exists": True}
+
+
+def _drop_options() -> dict:
+    if op.get_bind().dialect.name == "postgresql":
+        return {"postgresql_concurrently": True, "if_exists": True}
+    return {"if_exists": True}
+
+
+def upgrade() -> None:
+    options = _index_options()
+    drop_options = _drop_options()
+    with op.get_context().autocommit_block():
+        op.create_index(
+            'ix_tasks_user_active_created', 'tasks',
+            ['user_id', sa.text('created_at DESC'), sa.text('id DESC')],
+            postgresql_where=ACTIVE, sqlite_where=ACTIVE, **options,
+        )
+        op.create_index(
+            'ix_tasks_user_active_completed_at', 'tasks', ['user_id', 'completed_at'],
+            postgresql_where=ACTIVE, sqlite_where=ACTIVE, **options,
+        )
+        op.create_index(
+            'ix_tasks_user_pending_due', 'tasks', ['user_id', 'due_date'],
+            postgresql_where=PENDING, sqlite_where=PENDING, **options,
+        )
+        op.drop_index('ix_tasks_user_created_id', table_name='tasks', **drop_options)
+        op.drop_index('ix_tasks_user_id', table_name='tasks', **drop_options)
+
+
+def downgrade() -> None:
+    options = _index_options()
+    drop_options = _drop_options()
+    with op.get_context().autocommit_block():
+        op.create_index('ix_tasks_user_id', 'tasks', ['user_id'], **options)
+        op.create_index(
+            'ix_tasks_user_created_id', 'tasks', ['user_id', 'created_at', 'id'], **options
+        )
+        op.drop_index('ix_tasks_user_pending_due', table_name='tasks', **drop_options)
+        op.drop_index('ix_tasks_user_active_completed_at', table_name='tasks', **drop_options)
+        op.drop_index('ix_tasks_user_active_created', table_name='tasks', **drop_options)
@@ -0,0 +1,31 @@
+"""task events retries
+
+Revision ID: 0010
+Revises: 0009
+Create Date: 2026-10-17 15:26:26.052321
+
+Retry bookkeeping for the outbox: failed publishes back off and are
+dead-lettered after OUTBOX_MAX_ATTEMPTS instead of blocking the queue.
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+revision = '0010'
+down_revision = '0009'
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    with op.batch_alter_table('task_events', schema=None) as batch_op:
+        batch_op.add_column(sa.Column('attempts', sa.Integer(), nullable=False, server_default='0'))
+        batch_op.add_column(sa.Column('next_attempt_at', sa.DateTime(), nullable=True))
+        batch_op.add_column(sa.Column('dead_at', sa.DateTime(), nullable=True))
+
+
+def downgrade() -> None:
+    with op.batch_alter_table('task_events', schema=None) as batch_op:
+        batch_op.drop_column('dead_at')
+        batch_op.drop_column('next_attempt_at')
+        batch_op.drop_column('attempts')
@@ -0,0 +1,36 @@
+"""task events indexes
+
+Revision ID: 0011
+Revises: 0010
+Create Date: 2026-10-17 16:40:00.000000
+
+Partial indexes for the outbox: dispatch scans only live events, and the
+retention purge finds dead-lettered ones without a full scan.
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+revision = '0011'
+down_revision = '0010'
+branch_labels = None
+depends_on = None
+
+LIVE = sa.text('dead_at IS NULL')
+DEAD = sa.text('dead_at IS NOT NULL')
+
+
+def upgrade() -> None:
+    op.create_index(
+        'ix_task_events_live', 'task_events', ['id'],
+        postgresql_where=LIVE, sqlite_where=LIVE,
+    )
+    op.create_index(
+        'ix_task_events_dead_at', 'task_events', ['dead_at'],
+        postgresql_where=DEAD, sqlite_where=DEAD,
+    )
+
+
+def downgrade() -> None:
+    op.drop_index('ix_task_events_dead_at', table_name='task_events')
+    op.drop_index('ix_task_events_live', table_name='task_events')
@@ -1,4 +1,4 @@
-from fastapi import APIRouter, Depends, HTTPException, status
+from fastapi import APIRouter, Depends, HTTPException, Request, status
 from sqlalchemy.ext.asyncio import AsyncSession
 from pydantic import EmailStr, BaseModel
 from uuid import UUID
@@ -30,6 +30,7 @@ class RefreshTokenRequest(BaseModel):
 
 
 async def get_current_user(
+    request: Request,
     authorization: str | None = None,
     session: AsyncSession = Depends(get_session),
 ) -> User:
@@ -43,12 +44,16 @@ async def get_current_user(
     token = authorization.replace("Bearer ", "")
     try:
         user = await AuthService.get_current_user(token, session)
-        return user
     except ValueError as e:
         raise HTTPException(
             status_code=status.HTTP_401_UNAUTHORIZED,
             detail=str(e),
         )
+    
+    # Tag the request and its primary session so writes pin the user's reads
+    request.state.user_id = user.id
+    session.info["user_id"] = user.id
+    return user
 
 
 @router.post("/register", response_model=dict, status_code=status.HTTP_201_CREATED)
@@ -112,9 +117,12 @@ async def login(
 
 @router.post("/logout", response_model=dict)
 async def logout(
+    authorization: str | None = None,
     current_user: User = Depends(get_current_user),
+    session: AsyncSession = Depends(get_session),
 ) -> dict:
     """Logout user"""
+    await AuthService.logout_user(authorization.replace("Bearer ", ""), session)
     return {
         "success": True,
         "message": "Logged out successfully",
@@ -138,26 +146,14 @@ async def refresh(
     session: AsyncSession = Depends(get_session),
 ) -> dict:
     """Refresh access token"""
-    from src.security import create_access_token
-    
-    payload = verify_token(data.refresh_token)
-    if not payload or payload.get("type") != "refresh":
-        raise HTTPException(
-            status_code=status.HTTP_401_UNAUTHORIZED,
-            detail="Invalid refresh token",
-        )
-    
-    user_id = UUID(payload.get("sub"))
     try:
-        user = await AuthService.get_current_user(data.refresh_token, session)
-    except ValueError:
+        access_token = await AuthService.refresh_access_token(data.refresh_token, session)
+    except ValueError as e:
         raise HTTPException(
             status_code=status.HTTP_401_UNAUTHORIZED,
-            detail="User not found",
+            detail=str(e),
         )
     
-    access_token = create_access_token(user.id, user.email, user.name)
-    
     return {
         "success": True,
         "access_token": access_token,
@@ -0,0 +1,37 @@
+from fastapi import APIRouter, Depends, HTTPException, status, Query
+from uuid import UUID
+
+from src.api.v1.auth import get_current_user
+from src.api.v1.ws import manager, MAX_PRESENCE_WATCH
+from src.models.schemas import User
+
+router = APIRouter(prefix="/presence", tags=["presence"])
+
+
+@router.get("", response_model=dict)
+async def get_presence(
+    user_ids: str = Query(..., description="Comma-separated user ids"),
+    current_user: User = Depends(get_current_user),
+) -> dict:
+    """Get the presence of several users in one call.
+
+    Presence is public to signed-in users, the same as ``watch_presence``
+    on the WebSocket: it reveals only online status and last-seen time.
+    """
+    try:
+        ids = list(dict.fromkeys(UUID(part.strip()) for part in user_ids.split(",") if part.strip()))
+    except ValueError:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="user_ids must be comma-separated UUIDs",
+        )
+    if len(ids) > MAX_PRESENCE_WATCH:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=f"At most {MAX_PRESENCE_WATCH} user ids per request",
+        )
+    
+    return {
+        "success": True,
+        "presence": manager.presence.get(ids),
+    }
@@ -1,50 +1,37 @@
-from fastapi import APIRouter, Depends, Query
+from fastapi import APIRouter, Depends, HTTPException, Query
+from fastapi import status as http_status
 from sqlalchemy.ext.asyncio import AsyncSession
-from sqlalchemy import or_, and_, func
-from uuid import UUID
 
-from src.db import get_session
+from src.db import get_read_session
 from src.api.v1.auth import get_current_user
-from src.models.schemas import User, Task
-from src.services.auth_service import TaskService
+from src.models.schemas import User
+from src.services.search_service import SearchService
 
 router = APIRouter(prefix="/search", tags=["search"])
 
 @router.get("/tasks")
 async def search_tasks(
-    q: str = Query(..., min_length=1),
+    q: str = Query(..., min_length=1, max_length=200),
     priority: str = Query(None),
     status: str = Query(None),
+    page: int = Query(1, ge=1),
+    limit: int = Query(20, ge=1, le=100),
     current_user: User = Depends(get_current_user),
-    session: AsyncSession = Depends(get_session),
+    session: AsyncSession = Depends(get_read_session),
 ):
     """Full-text search for tasks"""
-    service = TaskService(session)
+    completed = {"completed": True, "pending": False}.get(status)
     
-    # Basic search implementation
-    query = session.query(Task).filter(Task.user_id == current_user.id)
-    
-    # Search in title and description
-    query = query.filter(
-        or_(
-            Task.title.ilike(f"%{q}%"),
-            Task.description.ilike(f"%{q}%"),
-        )
+    results, total = await SearchService.search_tasks(
+        user_id=current_user.id,
+        q=q,
+        session=session,
+        priority=priority,
+        completed=completed,
+        limit=limit,
+        offset=(page - 1) * limit,
     )
     
-    # Filter by priority
-    if priority:
-        query = query.filter(Task.priority == priority)
-    
-    # Filter by status
-    if status == "completed":
-        query = query.filter(Task.completed == True)
-    elif status == "pending":
-        query = query.filter(Task.completed == False)
-    
-    tasks = await session.execute(query)
-    results = tasks.scalars().all()
-    
     return {
         "success": True,
         "query": q,
@@ -58,25 +45,37 @@ async def search_tasks(
             }
             for t in results
         ],
-        "total": len(results),
+        "total": total,
+        "pagination": {
+            "page": page,
+            "limit": limit,
+            "pages": (total + limit - 1) // limit,
+        },
     }
 
 @router.get("/suggestions")
 async def search_suggestions(
-    q: str = Query(..., min_length=1),
+    q: list[str] = Query(...),
+    limit: int = Query(5, ge=1, le=20),
     current_user: User = Depends(get_current_user),
-    session: AsyncSession = Depends(get_session),
+    session: AsyncSession = Depends(get_read_session),
 ):
-    """Get search suggestions"""
-    query = session.query(Task.title).filter(
-        Task.user_id == current_user.id,
-        Task.title.ilike(f"%{q}%"),
-    ).distinct().limit(5)
+    """Get search suggestions.
+    
+    Repeat ``q`` to resolve several debounced prefixes in one request;
+    ``suggestions`` holds the results for the last one.
+    """
+    prefixes = list(dict.fromkeys(p.strip() for p in q if p.strip()))[:10]
+    if not prefixes:
+        raise HTTPException(
+            status_code=http_status.HTTP_422_UNPROCESSABLE_ENTITY,
+            detail="q must not be empty",
+        )
     
-    results = await session.execute(query)
-    suggestions = [row[0] for row in results]
+    results = await SearchService.suggest(current_user.id, prefixes, session, limit)
     
     return {
         "success": True,
-        "suggestions": suggestions,
+        "suggestions": results[prefixes[-1]],
+        "batch": results,
     }
@@ -1,8 +1,8 @@
-from fastapi import APIRouter, Depends, HTTPException, status
+from fastapi import APIRouter, Depends, HTTPException, status, Query
 from sqlalchemy.ext.asyncio import AsyncSession
-from datetime import datetime, timedelta
+from datetime import date, datetime, timedelta
 
-from src.db import get_session
+from src.db import get_read_session
 from src.models.schemas import User, UserStats
 from src.services.auth_service import TaskService
 from src.api.v1.auth import get_current_user
@@ -13,7 +13,7 @@ router = APIRouter(prefix="/stats", tags=["stats"])
 @router.get("/summary", response_model=dict)
 async def get_stats(
     current_user: User = Depends(get_current_user),
-    session: AsyncSession = Depends(get_session),
+    session: AsyncSession = Depends(get_read_session),
 ) -> dict:
     """Get user task statistics"""
     try:
@@ -31,40 +31,30 @@ async def get_stats(
 
 @router.get("/trends", response_model=dict)
 async def get_trends(
-    days: int = 7,
+    days: int = Query(7, ge=1, le=366),
+    start: date | None = Query(None),
+    end: date | None = Query(None),
+    tz_offset_minutes: int = Query(0, ge=-840, le=840),
     current_user: User = Depends(get_current_user),
-    session: AsyncSession = Depends(get_session),
+    session: AsyncSession = Depends(get_read_session),
 ) -> dict:
-    """Get task completion trends for the last N days"""
+    """Get task completion trends for the last N days or a start/end range"""
+    local_today = (datetime.utcnow() + timedelta(minutes=tz_offset_minutes)).date()
+    end = end or local_today
+    start = start or end - timedelta(days=days - 1)
+    if start > end or (end - start).days >= 366:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="Range must be between 1 and 366 days",
+        )
+    
     try:
-        from sqlalchemy import select, and_
-        from src.models.schemas import Task
-        
-        trends = []
-        for i in range(days):
-            day = datetime.utcnow() - timedelta(days=i)
-            start = day.replace(hour=0, minute=0, second=0, microsecond=0)
-            end = start + timedelta(days=1)
-            
-            stmt = select(Task).where(
-                and_(
-                    Task.user_id == current_user.id,
-                    Task.completed_at >= start,
-                    Task.completed_at < end,
-                    Task.deleted_at.is_(None),
-                )
-            )
-            result = await session.execute(stmt)
-            completed = len(result.scalars().all())
-            
-            trends.append({
-                "date": start.date().isoformat(),
-                "completed": completed,
-            })
-        
+        trends = await TaskService.get_completion_trends(
+            current_user.id, start, end, session, tz_offset_minutes
+        )
         return {
             "success": True,
-            "data": list(reversed(trends)),
+            "data": trends,
         }
     except Exception as e:
         raise HTTPException(
@@ -1,53 +1,131 @@
-from fastapi import APIRouter, Depends, HTTPException, status, Query
+from fastapi import APIRouter, Depends, Header, HTTPException, Request, Response, status, Query
 from fastapi.responses import StreamingResponse
-from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker
 from uuid import UUID
-import io
 import csv
-import json
+import hashlib
+import re
 
-from src.db import get_session
-from src.models.schemas import User, Task, TaskRead, TaskCreate, TaskUpdate, UserStats
-from src.services.auth_service import TaskService
+from src.config import settings
+from src.db import get_session, get_read_session, get_read_session_factory
+from src.models.schemas import (
+    User, Task, TaskRead, TaskCreate, TaskUpdate, TaskBatchRequest, UserStats
+)
+from src.services.auth_service import TaskService, TaskVersionConflict
+from src.services.export_service import ExportService, EXPORT_FORMATS
+from src.services.import_service import ImportService
 from src.api.v1.auth import get_current_user
 
 router = APIRouter(prefix="/tasks", tags=["tasks"])
 
+MAX_BATCH_IDS = 1000
+
+_ETAG = re.compile(r'(W/)?"([^"]*)"')
+
+
+def _task_etag(task: Task) -> str:
+    return f'"{task.version}"'
+
+
+def _list_etag(tasks: list[Task], *extra) -> str:
+    digest = hashlib.sha1()
+    for task in tasks:
+        digest.update(f"{task.id}:{task.version};".encode())
+    digest.update(repr(extra).encode())
+    return f'W/"{digest.hexdigest()}"'
+
+
+def _etag_matches(header: str | None, etag: str) -> bool:
+    """Weak If-None-Match comparison"""
+    if not header:
+        return False
+    tags = {tag.strip().removeprefix("W/") for tag in header.split(",")}
+    return "*" in tags or etag.removeprefix("W/") in tags
+
+
+def _if_match_versions(if_match: str | None) -> set[int] | None:
+    """Task versions accepted by If-Match, None when unconditional.
+
+    Every listed entity-tag counts. If-Match uses strong comparison, so
+    weak tags never match; a header naming no strong version fails.
+    """
+    if if_match is None or if_match.strip() == "*":
+        return None
+    versions = {
+        int(match.group(2))
+        for match in _ETAG.finditer(if_match)
+        if not match.group(1) and match.group(2).isdigit()
+    }
+    if not versions:
+        raise HTTPException(
+            status_code=status.HTTP_412_PRECONDITION_FAILED,
+            detail="If-Match does not name a strong task version",
+        )
+    return versions
+
 
 @router.get("", response_model=dict)
 async def list_tasks(
+    response: Response,
     completed: bool | None = Query(None),
     priority: str | None = Query(None),
     page: int = Query(1, ge=1),
     limit: int = Query(20, ge=1, le=100),
+    cursor: str | None = Query(None),
+    count: str = Query("exact", pattern="^(exact|estimate|none)$"),
+    if_none_match: str | None = Header(None),
     current_user: User = Depends(get_current_user),
-    session: AsyncSession = Depends(get_session),
-) -> dict:
-    """List user tasks with filters and pagination"""
+    session: AsyncSession = Depends(get_read_session),
+):
+    """List user tasks with filters and pagination.
+    
+    Pass ``cursor`` (the ``next_cursor`` of a previous page) for keyset
+    pagination; otherwise ``page`` is used as an offset. ``count`` selects an
+    exact total, a planner estimate, or no total at all.
+    """
     try:
-        tasks = await TaskService.list_tasks(
+        tasks, next_cursor = await TaskService.list_tasks_page(
             user_id=current_user.id,
+            session=session,
             completed=completed,
             priority=priority,
-            session=session,
+            limit=limit,
+            cursor=cursor,
+            offset=None if cursor else (page - 1) * limit,
         )
         
-        # Pagination
-        total = len(tasks)
-        start = (page - 1) * limit
-        end = start + limit
-        paginated_tasks = tasks[start:end]
+        total = None
+        if count != "none":
+            total = await TaskService.count_tasks(
+                user_id=current_user.id,
+                session=session,
+                completed=completed,
+                priority=priority,
+                estimate=count == "estimate",
+            )
+        
+        etag = _list_etag(tasks, page, cursor, total, next_cursor)
+        if _etag_matches(if_none_match, etag):
+            return Response(status_code=status.HTTP_304_NOT_MODIFIED, headers={"ETag": etag})
+        response.headers["ETag"] = etag
         
         return {
             "success": True,
-            "data": [TaskRead.model_validate(t) for t in paginated_tasks],
+            "data": [TaskRead.model_validate(t) for t in tasks],
             "pagination": {
-                "page": page,
+                "page": None if cursor else page,
                 "limit": limit,
                 "total": total,
-                "pages": (total + limit - 1) // limit,
+                "pages": (total + limit - 1) // limit if total is not None else None,
+                "next_cursor": next_cursor,
+                "has_more": next_cursor is not None,
             },
         }
+    except ValueError as e:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=str(e),
+        )
     except Exception as e:
         raise HTTPException(
             status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
@@ -55,6 +133,40 @@ async def list_tasks(
         )
 
 
+@router.get("/changes", response_model=dict)
+async def list_changes(
+    since: str | None = Query(None),
+    limit: int = Query(500, ge=1, le=1000),
+    current_user: User = Depends(get_current_user),
+    session: AsyncSession = Depends(get_read_session),
+) -> dict:
+    """Tasks changed since a watermark, for incremental client sync.
+    
+    Omit ``since`` for a full sync; then pass back ``next_since`` until
+    ``has_more`` is false.
+    """
+    try:
+        tasks, next_since, has_more = await TaskService.list_changes(
+            user_id=current_user.id,
+            session=session,
+            since=since,
+            limit=limit,
+        )
+    except ValueError as e:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=str(e),
+        )
+    
+    return {
+        "success": True,
+        "updated": [TaskRead.model_validate(t) for t in tasks if t.deleted_at is None],
+        "deleted": [str(t.id) for t in tasks if t.deleted_at is not None],
+        "next_since": next_since,
+        "has_more": has_more,
+    }
+
+
 @router.post("", response_model=dict, status_code=status.HTTP_201_CREATED)
 async def create_task(
     data: TaskCreate,
@@ -82,15 +194,100 @@ async def create_task(
         )
 
 
+async def _read_import_body(request: Request) -> bytes:
+    """Read the request body, refusing it once it passes IMPORT_MAX_BYTES"""
+    too_large = HTTPException(
+        status_code=status.HTTP_413_REQUEST_ENTITY_TOO_LARGE,
+        detail=f"Import body exceeds {settings.IMPORT_MAX_BYTES} bytes",
+    )
+    
+    content_length = request.headers.get("content-length")
+    if content_length is not None:
+        if not content_length.isdigit():
+            raise HTTPException(
+                status_code=status.HTTP_400_BAD_REQUEST,
+                detail="Invalid Content-Length header",
+            )
+        if int(content_length) > settings.IMPORT_MAX_BYTES:
+            raise too_large
+    
+    # Content-Length may be absent (chunked) or wrong, so count as we go
+    body = bytearray()
+    async for chunk in request.stream():
+        body += chunk
+        if len(body) > settings.IMPORT_MAX_BYTES:
+            raise too_large
+    return bytes(body)
+
+
+@router.post("/import", response_model=dict)
+async def import_tasks(
+    request: Request,
+    format: str = Query("json"),
+    batch_size: int = Query(settings.IMPORT_BATCH_SIZE, ge=1, le=10000),
+    current_user: User = Depends(get_current_user),
+    session: AsyncSession = Depends(get_session),
+) -> dict:
+    """Bulk import tasks from a CSV, JSON or NDJSON request body"""
+    if format not in EXPORT_FORMATS:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="Format must be csv, json or ndjson",
+        )
+    
+    body = await _read_import_body(request)
+    
+    try:
+        result = await ImportService.import_tasks(
+            current_user.id, format, body, session, batch_size
+        )
+    except (ValueError, UnicodeDecodeError, csv.Error) as e:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=str(e),
+        )
+    
+    return {
+        "success": result["failed"] == 0,
+        **result,
+    }
+
+
+@router.post("/batch", response_model=dict)
+async def batch_tasks(
+    data: TaskBatchRequest,
+    current_user: User = Depends(get_current_user),
+    session: AsyncSession = Depends(get_session),
+) -> dict:
+    """Complete, delete or update many tasks in one transaction"""
+    if sum(len(op.ids) for op in data.operations) > MAX_BATCH_IDS:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=f"A batch may target at most {MAX_BATCH_IDS} task ids",
+        )
+    
+    results = await TaskService.batch_mutate(current_user.id, data.operations, session)
+    return {
+        "success": True,
+        "results": results,
+    }
+
+
 @router.get("/{task_id}", response_model=dict)
 async def get_task(
     task_id: UUID,
+    response: Response,
+    if_none_match: str | None = Header(None),
     current_user: User = Depends(get_current_user),
-    session: AsyncSession = Depends(get_session),
-) -> dict:
+    session: AsyncSession = Depends(get_read_session),
+):
     """Get task by ID"""
     try:
         task = await TaskService.get_task(task_id, current_user.id, session)
+        etag = _task_etag(task)
+        if _etag_matches(if_none_match, etag):
+            return Response(status_code=status.HTTP_304_NOT_MODIFIED, headers={"ETag": etag})
+        response.headers["ETag"] = etag
         return {
             "success": True,
             "task": TaskRead.model_validate(task),
@@ -106,19 +303,30 @@ async def get_task(
 async def update_task(
     task_id: UUID,
     data: TaskUpdate,
+    response: Response,
+    if_match: str | None = Header(None),
     current_user: User = Depends(get_current_user),
+    session: AsyncSession = Depends(get_session),
 ) -> dict:
-    """Update task"""
+    """Update task; with If-Match the update only applies to that version"""
     try:
         task = await TaskService.update_task(
             task_id=task_id,
             user_id=current_user.id,
+            session=session,
+            expected_versions=_if_match_versions(if_match),
             **data.model_dump(exclude_unset=True),
         )
+        response.headers["ETag"] = _task_etag(task)
         return {
             "success": True,
             "task": TaskRead.model_validate(task),
         }
+    except TaskVersionConflict as e:
+        raise HTTPException(
+            status_code=status.HTTP_412_PRECONDITION_FAILED,
+            detail=str(e),
+        )
     except ValueError:
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND,
@@ -149,16 +357,26 @@ async def delete_task(
 @router.patch("/{task_id}/complete", response_model=dict)
 async def complete_task(
     task_id: UUID,
+    response: Response,
+    if_match: str | None = Header(None),
     current_user: User = Depends(get_current_user),
     session: AsyncSession = Depends(get_session),
 ) -> dict:
     """Mark task as complete"""
     try:
-        task = await TaskService.complete_task(task_id, current_user.id, session)
+        task = await TaskService.complete_task(
+            task_id, current_user.id, session, _if_match_versions(if_match)
+        )
+        response.headers["ETag"] = _task_etag(task)
         return {
             "success": True,
             "task": TaskRead.model_validate(task),
         }
+    except TaskVersionConflict as e:
+        raise HTTPException(
+            status_code=status.HTTP_412_PRECONDITION_FAILED,
+            detail=str(e),
+        )
     except ValueError:
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND,
@@ -170,50 +388,17 @@ async def complete_task(
 async def export_tasks(
     format: str,
     current_user: User = Depends(get_current_user),
-    session: AsyncSession = Depends(get_session),
+    session_factory: async_sessionmaker = Depends(get_read_session_factory),
 ):
-    """Export tasks as CSV or JSON"""
-    if format not in ["csv", "json"]:
+    """Export tasks as CSV, JSON or NDJSON, streamed as rows are read"""
+    if format not in EXPORT_FORMATS:
         raise HTTPException(
             status_code=status.HTTP_400_BAD_REQUEST,
-            detail="Format must be csv or json",
+            detail="Format must be csv, json or ndjson",
         )
     
-    try:
-        tasks = await TaskService.list_tasks(user_id=current_user.id, session=session)
-        
-        if format == "csv":
-            output = io.StringIO()
-            writer = csv.DictWriter(
-                output,
-                fieldnames=["id", "title", "description", "priority", "completed", "due_date"],
-            )
-            writer.writeheader()
-            for task in tasks:
-                writer.writerow({
-                    "id": str(task.id),
-                    "title": task.title,
-                    "description": task.description or "",
-                    "priority": task.priority,
-                    "completed": task.completed,
-                    "due_date": task.due_date or "",
-                })
-            output.seek(0)
-            return StreamingResponse(
-                iter([output.getvalue()]),
-                media_type="text/csv",
-                headers={"Content-Disposition": "attachment; filename=tasks.csv"},
-            )
-        else:  # json
-            data = [TaskRead.model_validate(t).model_dump() for t in tasks]
-            output = io.BytesIO(json.dumps(data, default=str).encode())
-            return StreamingResponse(
-                iter([output.getvalue()]),
-                media_type="application/json",
-                headers={"Content-Disposition": "attachment; filename=tasks.json"},
-            )
-    except Exception as e:
-        raise HTTPException(
-            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
-            detail=str(e),
-        )
+    return StreamingResponse(
+        ExportService.stream_tasks(current_user.id, format, session_factory),
+        media_type=EXPORT_FORMATS[format],
+        headers={"Content-Disposition": f"attachment; filename=tasks.{format}"},
+    )
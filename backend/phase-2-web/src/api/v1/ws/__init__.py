@@ -1,43 +1,268 @@
 from fastapi import APIRouter, WebSocket, Depends, Query
-from sqlalchemy.ext.asyncio import AsyncSession
-from uuid import UUID
+from sqlalchemy.ext.asyncio import async_sessionmaker
+from uuid import UUID, uuid4
+import asyncio
+import itertools
 import json
+import time
+from collections import OrderedDict
 from datetime import datetime
-from typing import Dict, Set
+from typing import Callable, Dict, Hashable, Iterable, List, Optional, Set
 import logging
 
-from src.db import get_session
+from src.config import settings
+from src.db import get_session_factory
 from src.security import verify_token
-from src.models.schemas import User, Task
+from src.models.schemas import User, Task, TaskEvent
+from src.services.auth_service import TaskService
+from src.api.v1.ws.backplane import Backplane, InProcessBackplane, create_backplane
+from src.api.v1.ws.presence import PresenceStore
 
 logger = logging.getLogger(__name__)
 
+# Close code for evicted slow consumers ("try again later")
+SLOW_CONSUMER_CLOSE_CODE = 1013
+CLOSE_TIMEOUT = 5.0
+# Most users one socket may watch the presence of
+MAX_PRESENCE_WATCH = 500
+
+
+class SendQueue:
+    """Bounded outbound queue for one socket, drained by its own writer task.
+
+    Messages may carry a key; under the ``coalesce`` policy a queued message
+    with the same key is replaced, so a backlog holds only the latest state
+    per task. When the queue is full the oldest (``coalesce``,
+    ``drop_oldest``) or the incoming (``drop_newest``) message is dropped.
+    A queue that stays full for ``evict_after`` seconds marks its consumer
+    for eviction.
+    """
+
+    def __init__(
+        self,
+        websocket: WebSocket,
+        user_id: UUID,
+        on_failure: Callable[["SendQueue"], None],
+        max_size: Optional[int] = None,
+        policy: Optional[str] = None,
+        evict_after: Optional[float] = None,
+    ):
+        # Defaults are read per queue so settings changed at runtime apply
+        if max_size is None:
+            max_size = settings.WS_SEND_QUEUE_SIZE
+        self.websocket = websocket
+        self.user_id = user_id
+        self.max_size = max(max_size, 1)
+        self.policy = policy if policy is not None else settings.WS_QUEUE_POLICY
+        self.evict_after = (
+            evict_after if evict_after is not None else settings.WS_SLOW_CONSUMER_SECONDS
+        )
+        self.dropped = 0
+        self.full_since: Optional[float] = None
+        self._on_failure = on_failure
+        self._pending: OrderedDict[Hashable, str] = OrderedDict()
+        self._seq = itertools.count()
+        self._ready = asyncio.Event()
+        self._writer = asyncio.create_task(self._run())
+    
+    def __len__(self) -> int:
+        return len(self._pending)
+    
+    def put(self, text: str, key: Optional[Hashable] = None) -> bool:
+        """Queue an encoded message; False means the consumer should be evicted"""
+        coalesce = key is not None and self.policy == "coalesce"
+        if coalesce and key in self._pending:
+            self._pending[key] = text
+            return True
+        
+        if len(self._pending) >= self.max_size:
+            now = time.monotonic()
+            if self.full_since is None:
+                self.full_since = now
+            elif now - self.full_since >= self.evict_after:
+                return False
+            self.dropped += 1
+            if self.policy == "drop_newest":
+                return True
+            self._pending.popitem(last=False)
+        
+        self._pending[key if coalesce else next(self._seq)] = text
+        self._ready.set()
+        return True
+    
+    async def _run(self):
+        try:
+            while True:
+                await self._ready.wait()
+                while self._pending:
+                    _, text = self._pending.popitem(last=False)
+                    if len(self._pending) < self.max_size:
+                        self.full_since = None
+                    await self.websocket.send_text(text)
+                self._ready.clear()
+        except asyncio.CancelledError:
+            raise
+        except Exception as e:
+            logger.warning(f"Dropping WebSocket after failed send: {e}")
+            self._on_failure(self)
+    
+    async def close(self, code: Optional[int] = None):
+        """Stop the writer and, with a code, close the socket"""
+        self._writer.cancel()
+        self._pending.clear()
+        if code is None:
+            return
+        try:
+            await asyncio.wait_for(self.websocket.close(code=code), CLOSE_TIMEOUT)
+        except Exception:
+            pass
+
+
 # Store active WebSocket connections
 class ConnectionManager:
-    def __init__(self):
+    """Tracks sockets and who is interested in which task.
+
+    Updates go only to the task owner's sockets. A socket that has never
+    subscribed receives all of its user's task updates; once it subscribes
+    it receives only the tasks it is subscribed to, until it disconnects.
+    Each message is encoded once and handed to each socket's SendQueue, so
+    a slow client only delays itself.
+
+    Broadcasts are published once on the backplane; every worker receives
+    them and fans out to the sockets it holds. Subscriptions are local to
+    the worker that registered them.
+
+    Presence lives in a PresenceStore. Transitions are published as one
+    delta per PRESENCE_BROADCAST_INTERVAL and sent to the sockets watching
+    the users that changed. Presence is public to signed-in users: there
+    is no sharing model to scope it by, so any user may watch any user id.
+    """
+
+    def __init__(self, backplane: Optional[Backplane] = None):
+        self.backplane = backplane or InProcessBackplane()
+        self.backplane.subscribe(self._deliver)
+        self.worker_id = uuid4().hex
         self.active_connections: Dict[UUID, Set[WebSocket]] = {}
-        self.user_presence: Dict[UUID, dict] = {}
+        self.presence = PresenceStore(settings.PRESENCE_TTL, settings.PRESENCE_MAX_ENTRIES)
+        # user_id -> sockets watching that user's presence
+        self.presence_watchers: Dict[UUID, Set[WebSocket]] = {}
+        self._socket_watches: Dict[WebSocket, Set[UUID]] = {}
+        self._presence_task: Optional[asyncio.Task] = None
+        # task_id -> sockets that subscribed to it
+        self.task_subscribers: Dict[UUID, Set[WebSocket]] = {}
+        # socket -> task ids it subscribed to; present once a socket has
+        # subscribed, even if it has since unsubscribed from everything
+        self._socket_tasks: Dict[WebSocket, Set[UUID]] = {}
+        self._queues: Dict[WebSocket, SendQueue] = {}
+        self._background: Set[asyncio.Task] = set()
     
     async def connect(self, user_id: UUID, websocket: WebSocket):
         await websocket.accept()
+        self._queues[websocket] = SendQueue(websocket, user_id, self._schedule_eviction)
         if user_id not in self.active_connections:
             self.active_connections[user_id] = set()
         self.active_connections[user_id].add(websocket)
-        self.user_presence[user_id] = {
-            "id": str(user_id),
-            "status": "online",
-            "last_seen": datetime.utcnow().isoformat(),
-        }
+        self.presence.touch(user_id)
     
     async def disconnect(self, user_id: UUID, websocket: WebSocket):
+        queue = self._queues.pop(websocket, None)
+        if queue is not None:
+            await queue.close()
+        for task_id in self._socket_tasks.pop(websocket, ()):
+            self._discard_subscriber(task_id, websocket)
+        self.watch_presence(websocket, ())
         if user_id in self.active_connections:
             self.active_connections[user_id].discard(websocket)
             if not self.active_connections[user_id]:
                 del self.active_connections[user_id]
-                self.user_presence[user_id]["status"] = "offline"
+                self.presence.set_offline(user_id)
+    
+    def subscribe(self, websocket: WebSocket, task_id: UUID):
+        """Deliver updates for a task to this socket"""
+        self.task_subscribers.setdefault(task_id, set()).add(websocket)
+        self._socket_tasks.setdefault(websocket, set()).add(task_id)
+    
+    def unsubscribe(self, websocket: WebSocket, task_id: UUID):
+        """Stop delivering a task's updates to this socket.
+
+        The socket stays in subscription mode, so unsubscribing from its
+        last task leaves it receiving no task updates at all.
+        """
+        self._discard_subscriber(task_id, websocket)
+        self._socket_tasks.setdefault(websocket, set()).discard(task_id)
+    
+    def _discard_subscriber(self, task_id: UUID, websocket: WebSocket):
+        subscribers = self.task_subscribers.get(task_id)
+        if subscribers is not None:
+            subscribers.discard(websocket)
+            if not subscribers:
+                del self.task_subscribers[task_id]
+    
+    def watch_presence(self, websocket: WebSocket, user_ids: Iterable[UUID]):
+        """Replace the set of users whose presence changes this socket receives"""
+        watched = set(itertools.islice(user_ids, MAX_PRESENCE_WATCH))
+        for user_id in self._socket_watches.pop(websocket, set()) - watched:
+            watchers = self.presence_watchers.get(user_id)
+            if watchers is not None:
+                watchers.discard(websocket)
+                if not watchers:
+                    del self.presence_watchers[user_id]
+        for user_id in watched:
+            self.presence_watchers.setdefault(user_id, set()).add(websocket)
+        if watched:
+            self._socket_watches[websocket] = watched
+    
+    def recipients(self, task_id: UUID, user_id: Optional[UUID] = None) -> Set[WebSocket]:
+        """Sockets interested in a task: its subscribers, plus the owner's
+        sockets that have not narrowed themselves with subscriptions"""
+        sockets = set(self.task_subscribers.get(task_id, ()))
+        if user_id is not None:
+            sockets.update(
+                websocket for websocket in self.active_connections.get(user_id, ())
+                if websocket not in self._socket_tasks
+            )
+        return sockets
+    
+    def _schedule_eviction(self, queue: SendQueue):
+        """Drop a consumer that is too slow or whose socket failed"""
+        if self._queues.get(queue.websocket) is not queue:
+            return
+        del self._queues[queue.websocket]
+        task = asyncio.create_task(self._evict(queue))
+        self._background.add(task)
+        task.add_done_callback(self._background.discard)
+    
+    async def _evict(self, queue: SendQueue):
+        await queue.close(SLOW_CONSUMER_CLOSE_CODE)
+        await self.disconnect(queue.user_id, queue.websocket)
+    
+    async def _send_all(
+        self, connections: Iterable[WebSocket], message: dict, key: Optional[Hashable] = None
+    ):
+        """Encode once and queue for every connection without waiting on sends"""
+        text = None
+        for connection in connections:
+            queue = self._queues.get(connection)
+            if queue is None:
+                continue
+            if text is None:
+                text = json.dumps(message)
+            if not queue.put(text, key):
+                logger.warning(f"Evicting slow WebSocket consumer for user {queue.user_id}")
+                self._schedule_eviction(queue)
     
-    async def broadcast_task_update(self, task_id: UUID, action: str, data: dict):
-        """Broadcast task update to all connected users"""
+    async def send_personal(self, websocket: WebSocket, message: dict):
+        """Queue a message for a single socket"""
+        await self._send_all([websocket], message)
+    
+    async def broadcast_task_update(
+        self, task_id: UUID, action: str, data: dict, user_id: Optional[UUID] = None
+    ):
+        """Send a task update to the sockets interested in the task.
+
+        ``user_id`` is the task owner; without it only subscribers receive
+        the update.
+        """
         message = {
             "type": "task_update",
             "action": action,
@@ -45,37 +270,168 @@ class ConnectionManager:
             "data": data,
             "timestamp": datetime.utcnow().isoformat(),
         }
-        
-        for user_connections in self.active_connections.values():
-            for connection in list(user_connections):
-                try:
-                    await connection.send_json(message)
-                except Exception as e:
-                    logger.error(f"Error broadcasting: {e}")
+        await self.backplane.publish({
+            "kind": "task",
+            "task_id": str(task_id),
+            "user_id": str(user_id) if user_id is not None else None,
+            "message": message,
+        })
     
     async def send_notification(self, user_id: UUID, notification: dict):
         """Send notification to specific user"""
-        if user_id not in self.active_connections:
-            return
-        
         message = {
             "type": "notification",
             "data": notification,
             "timestamp": datetime.utcnow().isoformat(),
         }
+        await self.backplane.publish({
+            "kind": "user",
+            "user_id": str(user_id),
+            "message": message,
+        })
+    
+    async def _deliver(self, event: dict):
+        """Fan a backplane event out to this worker's sockets"""
+        user_id = UUID(event["user_id"]) if event.get("user_id") else None
+        if event["kind"] == "task":
+            task_id = UUID(event["task_id"])
+            await self._send_all(
+                self.recipients(task_id, user_id), event["message"], key=("task", task_id)
+            )
+        elif event["kind"] == "user" and user_id in self.active_connections:
+            await self._send_all(self.active_connections[user_id], event["message"])
+        elif event["kind"] == "presence":
+            await self._deliver_presence(event)
+    
+    async def broadcast_presence(self):
+        """Expire stale presence and publish the transitions since last time.
+
+        Local users still online are re-announced so other workers, which
+        expire remote entries by TTL, keep them online. Remote users that
+        expired here are only reported to this worker's watchers.
+        """
+        self.presence.sweep()
+        await self._notify_presence_watchers(self.presence.drain_lapsed())
+        changes = self.presence.drain_changes()
+        refreshes = self.presence.drain_refreshes()
+        batches = self._presence_batches(changes, refreshes)
+        for sent, (batch_changes, batch_refreshes) in enumerate(batches):
+            try:
+                await self.backplane.publish({
+                    "kind": "presence",
+                    "origin": self.worker_id,
+                    "changes": batch_changes,
+                    "refreshes": batch_refreshes,
+                })
+            except Exception:
+                # Queue everything not yet published for the next broadcast
+                for unsent_changes, unsent_refreshes in batches[sent:]:
+                    self.presence.restore(unsent_changes, unsent_refreshes)
+                raise
+    
+    def _presence_batches(self, changes: list, refreshes: list) -> List[tuple]:
+        """Split a presence delta into events that fit the backplane's limit"""
+        if not changes and not refreshes:
+            return []
+        limit = self.backplane.max_payload_bytes
+        if limit is None:
+            return [(changes, refreshes)]
         
-        for connection in self.active_connections[user_id]:
+        envelope = len(json.dumps({
+            "kind": "presence", "origin": self.worker_id, "changes": [], "refreshes": [],
+        }).encode())
+        batches = [([], [])]
+        size = envelope
+        for index, entries in ((0, changes), (1, refreshes)):
+            for entry in entries:
+                # Each entry adds its own JSON plus a ", " separator
+                entry_size = len(json.dumps(entry).encode()) + 2
+                if size + entry_size > limit and any(batches[-1]):
+                    batches.append(([], []))
+                    size = envelope
+                batches[-1][index].append(entry)
+                size += entry_size
+        return batches
+    
+    async def _deliver_presence(self, event: dict):
+        if event["origin"] == self.worker_id:
+            await self._notify_presence_watchers(event["changes"])
+            return
+        
+        changed = []
+        for change in [*event["changes"], *event.get("refreshes", ())]:
+            last_seen = change["last_seen"]
+            if self.presence.apply(
+                UUID(change["id"]),
+                change["status"] == "online",
+                datetime.fromisoformat(last_seen) if last_seen else None,
+            ):
+                changed.append(change)
+        await self._notify_presence_watchers(changed)
+    
+    async def _notify_presence_watchers(self, changes: list):
+        by_socket: Dict[WebSocket, list] = {}
+        for change in changes:
+            for websocket in self.presence_watchers.get(UUID(change["id"]), ()):
+                by_socket.setdefault(websocket, []).append(change)
+        timestamp = datetime.utcnow().isoformat()
+        for websocket, socket_changes in by_socket.items():
+            await self._send_all(
+                [websocket], {"type": "presence", "changes": socket_changes, "timestamp": timestamp}
+            )
+    
+    async def _presence_loop(self):
+        while True:
+            await asyncio.sleep(settings.PRESENCE_BROADCAST_INTERVAL)
             try:
-                await connection.send_json(message)
+                await self.broadcast_presence()
             except Exception as e:
-                logger.error(f"Error sending notification: {e}")
+                logger.error(f"Error broadcasting presence: {e}")
+    
+    async def start(self):
+        self._presence_task = asyncio.create_task(self._presence_loop())
+        await self.backplane.start()
+    
+    async def stop(self):
+        if self._presence_task is not None:
+            self._presence_task.cancel()
+            self._presence_task = None
+        await self.backplane.stop()
+
+manager = ConnectionManager(
+    create_backplane(settings.REALTIME_BACKPLANE, settings.REALTIME_CHANNEL)
+)
+
+async def publish_task_event(task_event: TaskEvent):
+    """Deliver a committed outbox event to interested sockets"""
+    await manager.broadcast_task_update(
+        task_event.task_id,
+        task_event.action,
+        json.loads(task_event.payload),
+        user_id=task_event.user_id,
+    )
+
+
+async def _check_task_access(
+    session_factory: async_sessionmaker, task_id: UUID, user_id: UUID
+):
+    """Raise ValueError unless the user owns the task.
+
+    Uses its own short session so a long-lived socket never holds a
+    pooled connection between messages.
+    """
+    async with session_factory() as session:
+        await TaskService.get_task(task_id, user_id, session)
 
-manager = ConnectionManager()
 
 router = APIRouter(prefix="/ws", tags=["websocket"])
 
 @router.websocket("/connect/{token}")
-async def websocket_endpoint(websocket: WebSocket, token: str, session: AsyncSession = Depends(get_session)):
+async def websocket_endpoint(
+    websocket: WebSocket,
+    token: str,
+    session_factory: async_sessionmaker = Depends(get_session_factory),
+):
     """WebSocket endpoint for real-time updates"""
     # Verify token
     payload = verify_token(token)
@@ -89,25 +445,54 @@ async def websocket_endpoint(websocket: WebSocket, token: str, session: AsyncSes
     try:
         while True:
             data = await websocket.receive_json()
+            try:
+                if data.get("type") == "ping":
+                    manager.presence.touch(user_id)
+                    await manager.send_personal(websocket, {"type": "pong"})
             
-            if data.get("type") == "ping":
-                await websocket.send_json({"type": "pong"})
-            
-            elif data.get("type") == "task_status":
-                # Broadcast task status change
-                await manager.broadcast_task_update(
-                    UUID(data.get("task_id")),
-                    "status_changed",
-                    {"status": data.get("status")},
-                )
+                elif data.get("type") == "task_status":
+                    # Broadcast task status change for the user's own task
+                    task_id = UUID(data.get("task_id"))
+                    await _check_task_access(session_factory, task_id, user_id)
+                    try:
+                        await manager.broadcast_task_update(
+                            task_id,
+                            "status_changed",
+                            {"status": data.get("status")},
+                            user_id=user_id,
+                        )
+                    except Exception as e:
+                        # The backplane is down, not this socket; keep it open
+                        logger.error(f"Error publishing task status: {e}")
+                        await manager.send_personal(websocket, {
+                            "type": "error",
+                            "detail": "Task status could not be broadcast",
+                        })
+                
+                elif data.get("type") == "subscribe":
+                    task_id = UUID(data.get("task_id"))
+                    await _check_task_access(session_factory, task_id, user_id)
+                    manager.subscribe(websocket, task_id)
+                
+                elif data.get("type") == "unsubscribe":
+                    manager.unsubscribe(websocket, UUID(data.get("task_id")))
+                
+                elif data.get("type") == "presence":
+                    manager.presence.touch(user_id)
+                
+                elif data.get("type") == "watch_presence":
+                    requested = (data.get("user_ids") or [])[:MAX_PRESENCE_WATCH]
+                    user_ids = [UUID(str(u)) for u in requested]
+                    manager.watch_presence(websocket, user_ids)
+                    await manager.send_personal(websocket, {
+                        "type": "presence",
+                        "changes": manager.presence.get(user_ids),
+                        "timestamp": datetime.utcnow().isoformat(),
+                    })
             
-            elif data.get("type") == "presence":
-                # Update user presence
-                manager.user_presence[user_id] = {
-                    "id": str(user_id),
-                    "status": "online",
-                    "last_seen": datetime.utcnow().isoformat(),
-                }
+            except (ValueError, TypeError) as e:
+                # Bad id or a task the user cannot see; keep the socket open
+                await manager.send_personal(websocket, {"type": "error", "detail": str(e)})
     
     except Exception as e:
         logger.error(f"WebSocket error: {e}")
@@ -0,0 +1,193 @@
+import asyncio
+import json
+import logging
+from abc import ABC, abstractmethod
+from typing import Awaitable, Callable, List, Optional, Set
+
+from sqlalchemy.ext.asyncio import AsyncConnection, AsyncEngine
+
+logger = logging.getLogger(__name__)
+
+EventHandler = Callable[[dict], Awaitable[None]]
+
+# PostgreSQL rejects NOTIFY payloads of 8000 bytes or more
+NOTIFY_MAX_BYTES = 7999
+
+
+class Backplane(ABC):
+    """Carries realtime events between workers.
+
+    Every event published on any worker is handed to the handler of every
+    worker, including the publisher, which then fans it out to its own
+    sockets. Events must be JSON-serializable. ``publish`` may raise when
+    the transport is down; callers decide whether to retry or drop.
+
+    ``max_payload_bytes`` is the largest encoded event the transport
+    carries, or None when unlimited; callers batching many entries into
+    one event split it to fit.
+    """
+
+    max_payload_bytes: Optional[int] = None
+
+    def __init__(self):
+        self._handler: Optional[EventHandler] = None
+
+    def subscribe(self, handler: EventHandler) -> None:
+        """Set the coroutine that receives every event"""
+        self._handler = handler
+
+    @abstractmethod
+    async def start(self) -> None:
+        """Open whatever the backplane needs before events flow"""
+
+    @abstractmethod
+    async def stop(self) -> None:
+        """Release the backplane's resources"""
+
+    @abstractmethod
+    async def publish(self, event: dict) -> None:
+        """Hand an event to every worker's handler"""
+
+    async def _dispatch(self, event: dict) -> None:
+        if self._handler is None:
+            return
+        try:
+            await self._handler(event)
+        except Exception as e:
+            logger.error(f"Error handling realtime event: {e}")
+
+
+class InProcessBackplane(Backplane):
+    """Single-process default: events go straight to the local handler"""
+
+    async def start(self) -> None:
+        pass
+
+    async def stop(self) -> None:
+        pass
+
+    async def publish(self, event: dict) -> None:
+        await self._dispatch(event)
+
+
+class LocalBackplane(Backplane):
+    """Connects several managers in one process as if they were separate
+    workers, for tests. Backplanes sharing a ``peers`` list see each
+    other's events; payloads take a JSON round trip as on the wire.
+    """
+
+    def __init__(self, peers: List["LocalBackplane"]):
+        super().__init__()
+        self.peers = peers
+        peers.append(self)
+
+    async def start(self) -> None:
+        pass
+
+    async def stop(self) -> None:
+        if self in self.peers:
+            self.peers.remove(self)
+
+    async def publish(self, event: dict) -> None:
+        payload = json.dumps(event)
+        for peer in list(self.peers):
+            await peer._dispatch(json.loads(payload))
+
+
+class PostgresBackplane(Backplane):
+    """LISTEN/NOTIFY on a dedicated asyncpg connection.
+
+    NOTIFY payloads are limited to 8000 bytes, so oversized task updates are
+    sent without their ``data`` and flagged ``truncated``; clients refetch.
+    Other oversized events are rejected. The connection is re-established
+    with backoff if it drops.
+    """
+
+    max_payload_bytes = NOTIFY_MAX_BYTES
+
+    def __init__(self, engine: AsyncEngine, channel: str):
+        super().__init__()
+        self.engine = engine
+        self.channel = channel
+        self._conn: Optional[AsyncConnection] = None
+        self._driver = None
+        self._lock = asyncio.Lock()
+        self._reconnecting: Optional[asyncio.Task] = None
+        self._pending: Set[asyncio.Task] = set()
+        self._stopped = False
+
+    async def start(self) -> None:
+        self._stopped = False
+        await self._connect()
+
+    async def stop(self) -> None:
+        self._stopped = True
+        if self._reconnecting is not None:
+            self._reconnecting.cancel()
+        await self._close()
+
+    async def _connect(self) -> None:
+        self._conn = await self.engine.connect()
+        raw = await self._conn.get_raw_connection()
+        self._driver = raw.driver_connection
+        await self._driver.add_listener(self.channel, self._on_notify)
+        self._driver.add_termination_listener(self._on_terminate)
+
+    async def _close(self) -> None:
+        conn, self._conn, self._driver = self._conn, None, None
+        if conn is not None:
+            try:
+                await conn.invalidate()
+            except Exception:
+                pass
+
+    def _on_notify(self, connection, pid, channel, payload) -> None:
+        task = asyncio.create_task(self._dispatch(json.loads(payload)))
+        self._pending.add(task)
+        task.add_done_callback(self._pending.discard)
+
+    def _on_terminate(self, connection) -> None:
+        if self._stopped or self._reconnecting is not None:
+            return
+        logger.warning("Realtime backplane connection lost; reconnecting")
+        self._reconnecting = asyncio.create_task(self._reconnect())
+
+    async def _reconnect(self) -> None:
+        delay = 1.0
+        try:
+            while not self._stopped:
+                await self._close()
+                try:
+                    await self._connect()
+                    return
+                except Exception as e:
+                    logger.error(f"Realtime backplane reconnect failed: {e}")
+                    await asyncio.sleep(delay)
+                    delay = min(delay * 2, 30.0)
+        finally:
+            self._reconnecting = None
+
+    async def publish(self, event: dict) -> None:
+        payload = json.dumps(event)
+        if len(payload.encode()) > NOTIFY_MAX_BYTES and "message" in event:
+            message = dict(event["message"], data=None, truncated=True)
+            payload = json.dumps(dict(event, message=message))
+        if len(payload.encode()) > NOTIFY_MAX_BYTES:
+            raise ValueError(f"Realtime event exceeds {NOTIFY_MAX_BYTES} bytes")
+        if self._driver is None:
+            raise RuntimeError("Realtime backplane is not connected")
+        async with self._lock:
+            await self._driver.execute("SELECT pg_notify($1, $2)", self.channel, payload)
+
+
+def create_backplane(kind: str, channel: str) -> Backplane:
+    """Build the backplane named by REALTIME_BACKPLANE"""
+    if kind == "memory":
+        return InProcessBackplane()
+    if kind == "postgres":
+        from src.db import engine
+
+        if engine.dialect.name != "postgresql":
+            raise ValueError("REALTIME_BACKPLANE=postgres requires a PostgreSQL DATABASE_URL")
+        return PostgresBackplane(engine, channel)
+    raise ValueError(f"Unknown realtime backplane: {kind}")
@@ -0,0 +1,166 @@
+import time
+from collections import OrderedDict
+from datetime import datetime, timezone
+from typing import Dict, Iterable, List, Optional
+from uuid import UUID
+
+
+class _Presence:
+    __slots__ = ("online", "seen", "local", "announced")
+
+    def __init__(self, online: bool, seen: float, local: bool):
+        self.online = online
+        self.seen = seen  # time.monotonic() of the last heartbeat or disconnect
+        self.local = local  # heartbeats arrive on this worker
+        self.announced = seen  # when this worker last published the entry
+
+
+class PresenceStore:
+    """Bounded presence table keyed by user id.
+
+    Entries are kept in last-seen order, so heartbeats are O(1) and the
+    sweeper only walks entries that are due. Entries not seen for ``ttl``
+    seconds are dropped, and a dropped online user is reported offline.
+
+    Online/offline transitions of local users are collected for delta
+    broadcasts, and local users who stay online are re-announced every
+    half TTL. Entries learned from other workers expire by the
+    ``last_seen`` they arrived with, so users of a worker that went away
+    lapse to offline here too.
+    """
+
+    def __init__(self, ttl: float, max_entries: int):
+        self.ttl = ttl
+        self.max_entries = max(max_entries, 1)
+        self._entries: OrderedDict[UUID, _Presence] = OrderedDict()
+        self._changes: Dict[UUID, _Presence] = {}
+        self._refreshes: Dict[UUID, _Presence] = {}
+        self._lapsed: Dict[UUID, _Presence] = {}
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def touch(self, user_id: UUID) -> None:
+        """Record a heartbeat: the user is online now"""
+        self._set(user_id, True, time.monotonic(), local=True)
+
+    def set_offline(self, user_id: UUID) -> None:
+        """Record that the user's last connection on this worker closed"""
+        self._set(user_id, False, time.monotonic(), local=True)
+
+    def apply(self, user_id: UUID, online: bool, last_seen: Optional[datetime]) -> bool:
+        """Apply a delta from another worker; ``last_seen`` is naive UTC.
+
+        Returns whether the user's status changed as seen from this worker.
+        """
+        entry = self._entries.get(user_id)
+        if entry is not None and entry.local and entry.online:
+            return False  # connected here, so this worker's heartbeats win
+        was_online = entry is not None and entry.online
+        self._set(user_id, online, self._monotonic(last_seen), local=False, record=False)
+        return was_online != online
+
+    def _set(self, user_id: UUID, online: bool, seen: float, local: bool, record: bool = True) -> None:
+        entry = self._entries.get(user_id)
+        changed = entry is None or entry.online != online
+        self._lapsed.pop(user_id, None)
+        if entry is None:
+            entry = self._entries[user_id] = _Presence(online, seen, local)
+        else:
+            entry.online, entry.seen, entry.local = online, seen, local
+            self._entries.move_to_end(user_id)
+        if record:
+            if changed:
+                self._changes[user_id] = entry
+            elif online and seen - entry.announced >= self.ttl / 2:
+                self._refreshes[user_id] = entry
+        while len(self._entries) > self.max_entries:
+            evicted_id, evicted = self._entries.popitem(last=False)
+            self._went_away(evicted_id, evicted)
+
+    def _went_away(self, user_id: UUID, entry: _Presence) -> None:
+        if not entry.online:
+            return
+        entry.online = False
+        if entry.local:
+            self._changes[user_id] = entry
+        else:
+            self._lapsed[user_id] = entry
+
+    def sweep(self) -> int:
+        """Expire entries not seen within the TTL; returns how many"""
+        cutoff = time.monotonic() - self.ttl
+        expired = 0
+        while self._entries:
+            user_id, entry = next(iter(self._entries.items()))
+            if entry.seen > cutoff:
+                break
+            del self._entries[user_id]
+            self._went_away(user_id, entry)
+            expired += 1
+        return expired
+
+    def get(self, user_ids: Iterable[UUID]) -> List[dict]:
+        """Presence of each requested user; unknown users are offline"""
+        return [self._describe(user_id, self._entries.get(user_id)) for user_id in user_ids]
+
+    def drain_changes(self) -> List[dict]:
+        """Transitions of local users since the last call, one per user"""
+        changes, self._changes = self._changes, {}
+        return self._announce(changes)
+
+    def drain_refreshes(self) -> List[dict]:
+        """Local users due to be re-announced as still online"""
+        refreshes, self._refreshes = self._refreshes, {}
+        return self._announce(
+            {user_id: entry for user_id, entry in refreshes.items() if entry.online}
+        )
+
+    def restore(self, changes: List[dict], refreshes: List[dict]) -> None:
+        """Requeue drained entries whose publish failed"""
+        for queue, drained in ((self._changes, changes), (self._refreshes, refreshes)):
+            for change in drained:
+                user_id = UUID(change["id"])
+                entry = self._entries.get(user_id)
+                if entry is None and change["status"] == "offline":
+                    # Expired since; keep a detached entry to report it
+                    last_seen = change["last_seen"]
+                    entry = _Presence(
+                        False,
+                        self._monotonic(datetime.fromisoformat(last_seen) if last_seen else None),
+                        local=True,
+                    )
+                if entry is not None and entry.local:
+                    queue.setdefault(user_id, entry)
+
+    def drain_lapsed(self) -> List[dict]:
+        """Users of other workers that expired here since the last call"""
+        lapsed, self._lapsed = self._lapsed, {}
+        return [self._describe(user_id, entry) for user_id, entry in lapsed.items()]
+
+    def _announce(self, entries: Dict[UUID, _Presence]) -> List[dict]:
+        now = time.monotonic()
+        for entry in entries.values():
+            entry.announced = now
+        return [self._describe(user_id, entry) for user_id, entry in entries.items()]
+
+    @staticmethod
+    def _monotonic(last_seen: Optional[datetime]) -> float:
+        """time.monotonic() equivalent of a naive UTC timestamp"""
+        now = time.monotonic()
+        if last_seen is None:
+            return now
+        age = time.time() - last_seen.replace(tzinfo=timezone.utc).timestamp()
+        return now - max(age, 0.0)
+
+    def _describe(self, user_id: UUID, entry: Optional[_Presence]) -> dict:
+        if entry is None:
+            return {"id": str(user_id), "status": "offline", "last_seen": None}
+        # Entries the sweeper has not reached yet are already offline
+        online = entry.online and entry.seen > time.monotonic() - self.ttl
+        seen = time.time() - (time.monotonic() - entry.seen)
+        return {
+            "id": str(user_id),
+            "status": "online" if online else "offline",
+            "last_seen": datetime.utcfromtimestamp(seen).isoformat(),
+        }
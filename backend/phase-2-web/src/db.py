@@ -1,21 +1,75 @@
+import time
+from pathlib import Path
+from uuid import UUID
+from fastapi import Request
+from alembic.runtime.migration import MigrationContext
+from alembic.script import ScriptDirectory
+from sqlalchemy import event
 from sqlalchemy.ext.asyncio import create_async_engine, AsyncSession, async_sessionmaker
-from sqlmodel import SQLModel
+from sqlalchemy.orm import Session as OrmSession
+from sqlalchemy.exc import TimeoutError as PoolTimeoutError
+from sqlalchemy.pool import AsyncAdaptedQueuePool
 from src.config import settings
 from typing import AsyncGenerator
 
 
-# Create async engine - use SQLite for local dev if no postgres available
-db_url = settings.DATABASE_URL
-if "postgresql" in db_url:
-    db_url = db_url.replace("postgresql://", "postgresql+asyncpg://")
-else:
-    db_url = "sqlite+aiosqlite:///./evolution_todo.db"
+def build_db_url(url: str) -> str:
+    """Map a configured database URL onto its async driver"""
+    if url.startswith(("postgresql://", "postgres://")):
+        return "postgresql+asyncpg://" + url.split("://", 1)[1]
+    if url.startswith("sqlite://"):
+        return url.replace("sqlite://", "sqlite+aiosqlite://", 1)
+    if url.startswith(("postgresql+asyncpg://", "sqlite+aiosqlite://")):
+        return url
+    raise ValueError(f"Unsupported DATABASE_URL scheme: {url.split('://', 1)[0]}")
+
+
+class TimedQueuePool(AsyncAdaptedQueuePool):
+    """Queue pool that records how long checkouts wait for a connection"""
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.waits = {"count": 0, "total": 0.0, "max": 0.0, "timeouts": 0}
+
+    def _do_get(self):
+        start = time.perf_counter()
+        try:
+            return super()._do_get()
+        except PoolTimeoutError:
+            self.waits["timeouts"] += 1
+            raise
+        finally:
+            waited = time.perf_counter() - start
+            self.waits["count"] += 1
+            self.waits["total"] += waited
+            self.waits["max"] = max(self.waits["max"], waited)
+
+
+def engine_options(url: str) -> dict:
+    """Engine keyword arguments for a driver URL"""
+    if url.startswith("sqlite"):
+        return {"connect_args": {"check_same_thread": False}}
+
+    connect_args = {
+        "statement_cache_size": settings.DB_STATEMENT_CACHE_SIZE,
+        "timeout": settings.DB_CONNECT_TIMEOUT,
+    }
+    if settings.DB_COMMAND_TIMEOUT is not None:
+        connect_args["command_timeout"] = settings.DB_COMMAND_TIMEOUT
+    return {
+        "poolclass": TimedQueuePool,
+        "connect_args": connect_args,
+        **settings.db_pool_options(),
+    }
+
+
+db_url = build_db_url(settings.DATABASE_URL)
 
 engine = create_async_engine(
     db_url,
     echo=settings.DB_ECHO,
     future=True,
-    connect_args={"check_same_thread": False} if "sqlite" in db_url else {},
+    **engine_options(db_url),
 )
 
 # Create async session factory
@@ -23,6 +77,97 @@ async_session_factory = async_sessionmaker(
     engine, class_=AsyncSession, expire_on_commit=False, future=True
 )
 
+# Read replica; falls back to the primary when not configured
+if settings.DATABASE_READ_URL:
+    read_db_url = build_db_url(settings.DATABASE_READ_URL)
+    read_engine = create_async_engine(
+        read_db_url,
+        echo=settings.DB_ECHO,
+        future=True,
+        **engine_options(read_db_url),
+    )
+else:
+    read_engine = engine
+
+read_session_factory = async_sessionmaker(
+    read_engine, class_=AsyncSession, expire_on_commit=False, future=True
+)
+
+# Read-your-writes: users who recently committed a write are served from
+# the primary until their pin expires. Pins are per process.
+_primary_pins: dict[UUID, float] = {}
+_MAX_PINS = 100_000
+
+
+def pin_to_primary(user_id: UUID) -> None:
+    """Route a user's reads to the primary for READ_AFTER_WRITE_PIN_SECONDS"""
+    now = time.monotonic()
+    if len(_primary_pins) >= _MAX_PINS:
+        for key in [k for k, until in _primary_pins.items() if until <= now]:
+            del _primary_pins[key]
+    _primary_pins[user_id] = now + settings.READ_AFTER_WRITE_PIN_SECONDS
+
+
+def is_pinned_to_primary(user_id: UUID) -> bool:
+    until = _primary_pins.get(user_id)
+    if until is None:
+        return False
+    if until <= time.monotonic():
+        del _primary_pins[user_id]
+        return False
+    return True
+
+
+@event.listens_for(OrmSession, "after_flush")
+def _mark_flush_write(session, flush_context):
+    session.info["has_writes"] = True
+
+
+@event.listens_for(OrmSession, "do_orm_execute")
+def _mark_statement_write(orm_execute_state):
+    if orm_execute_state.is_insert or orm_execute_state.is_update or orm_execute_state.is_delete:
+        orm_execute_state.session.info["has_writes"] = True
+
+
+@event.listens_for(OrmSession, "after_commit")
+def _pin_writer(session):
+    user_id = session.info.get("user_id")
+    if session.info.pop("has_writes", False) and user_id is not None:
+        pin_to_primary(user_id)
+
+
+def get_pool_stats() -> dict:
+    """Connection pool usage for monitoring.
+
+    Reports the primary pool; with a read replica configured its pool is
+    included under ``replica``.
+    """
+    stats = _pool_stats(engine.pool)
+    if read_engine is not engine:
+        stats["replica"] = _pool_stats(read_engine.pool)
+    return stats
+
+
+def _pool_stats(pool) -> dict:
+    stats = {"pool": type(pool).__name__}
+    if isinstance(pool, AsyncAdaptedQueuePool):
+        stats.update({
+            "size": pool.size(),
+            "checked_out": pool.checkedout(),
+            "checked_in": pool.checkedin(),
+            "overflow": max(pool.overflow(), 0),
+            "max_overflow": settings.db_pool_options()["max_overflow"],
+        })
+    if isinstance(pool, TimedQueuePool):
+        count = pool.waits["count"]
+        stats["wait"] = {
+            "checkouts": count,
+            "avg_ms": round(pool.waits["total"] / count * 1000, 3) if count else 0.0,
+            "max_ms": round(pool.waits["max"] * 1000, 3),
+            "timeouts": pool.waits["timeouts"],
+        }
+    return stats
+
 
 async def get_session() -> AsyncGenerator[AsyncSession, None]:
     """Get database session"""
@@ -30,12 +175,62 @@ async def get_session() -> AsyncGenerator[AsyncSession, None]:
         yield session
 
 
+def get_session_factory() -> async_sessionmaker:
+    """Primary session factory, for handlers that open short sessions
+    themselves instead of holding one for their whole lifetime (WebSockets)
+    """
+    return async_session_factory
+
+
+def get_read_session_factory(request: Request) -> async_sessionmaker:
+    """Session factory for read-only work, for handlers that outlive the
+    request's dependencies such as streaming responses.
+    
+    Uses the read replica unless the authenticated user wrote recently.
+    The user is taken from ``request.state.user_id``, which
+    get_current_user sets, so declare ``current_user`` before the session.
+    """
+    user_id = getattr(request.state, "user_id", None)
+    if read_engine is engine or (user_id is not None and is_pinned_to_primary(user_id)):
+        return async_session_factory
+    return read_session_factory
+
+
+async def get_read_session(request: Request) -> AsyncGenerator[AsyncSession, None]:
+    """Get a session for read-only handlers (see get_read_session_factory)"""
+    async with get_read_session_factory(request)() as session:
+        yield session
+
+
+MIGRATIONS_DIR = Path(__file__).resolve().parent.parent / "migrations"
+
+
+class SchemaVersionError(RuntimeError):
+    """The database is not at the latest Alembic revision"""
+
+
 async def init_db() -> None:
-    """Initialize database"""
-    async with engine.begin() as conn:
-        await conn.run_sync(SQLModel.metadata.create_all)
+    """Check the database schema is at the latest migration.
+
+    The schema is owned by Alembic; run ``alembic upgrade head`` to create
+    or update it. Startup never creates tables. Raises SchemaVersionError
+    when the revision is not head.
+    """
+    heads = set(ScriptDirectory(str(MIGRATIONS_DIR)).get_heads())
+    async with engine.connect() as conn:
+        current = await conn.run_sync(
+            lambda sync_conn: set(MigrationContext.configure(sync_conn).get_current_heads())
+        )
+    if current != heads:
+        found = ", ".join(sorted(current)) or "none"
+        raise SchemaVersionError(
+            f"Database schema revision is {found}, expected {', '.join(sorted(heads))}; "
+            "run `alembic upgrade head`"
+        )
 
 
 async def close_db() -> None:
     """Close database"""
     await engine.dispose()
+    if read_engine is not engine:
+        await read_engine.dispose()
@@ -3,8 +3,12 @@ from fastapi.middleware.cors import CORSMiddleware
 from contextlib import asynccontextmanager
 
 from src.config import settings
-from src.db import init_db, close_db
-from src.api.v1 import auth, tasks, stats
+from src.db import init_db, close_db, get_pool_stats, async_session_factory, SchemaVersionError
+from src.security import get_password_hash_stats
+from src.api.v1 import auth, tasks, stats, analytics, search, ws, presence
+from src.services.outbox import OutboxDispatcher
+
+outbox_dispatcher = OutboxDispatcher(async_session_factory, ws.publish_task_event)
 
 
 @asynccontextmanager
@@ -13,11 +17,21 @@ async def lifespan(app: FastAPI):
     # Startup
     try:
         await init_db()
+    except SchemaVersionError:
+        # Serving against the wrong schema is worse than not starting
+        raise
     except Exception as e:
         print(f"⚠️  Database initialization warning: {str(e)}")
         print("Continuing without database...")
+    try:
+        await ws.manager.start()
+    except Exception as e:
+        print(f"⚠️  Realtime backplane warning: {str(e)}")
+    await outbox_dispatcher.start()
     yield
     # Shutdown
+    await outbox_dispatcher.stop()
+    await ws.manager.stop()
     try:
         await close_db()
     except Exception as e:
@@ -50,10 +64,23 @@ async def health_check():
     }
 
 
+@app.get("/api/v1/health/pools")
+async def pool_stats():
+    """Connection and password hash pool usage"""
+    return {
+        "database": get_pool_stats(),
+        "password_hash": get_password_hash_stats(),
+    }
+
+
 # API v1 routers
 app.include_router(auth.router, prefix=settings.API_V1_STR)
 app.include_router(tasks.router, prefix=settings.API_V1_STR)
 app.include_router(stats.router, prefix=settings.API_V1_STR)
+app.include_router(analytics.router, prefix=settings.API_V1_STR)
+app.include_router(search.router, prefix=settings.API_V1_STR)
+app.include_router(ws.router, prefix=settings.API_V1_STR)
+app.include_router(presence.router, prefix=settings.API_V1_STR)
 
 
 # Error handlers
@@ -1,7 +1,8 @@
 from datetime import datetime
-from typing import Optional
+from typing import Literal, Optional
 from uuid import UUID, uuid4
-from sqlmodel import SQLModel, Field, Relationship
+from sqlalchemy import DDL, Index, event
+from sqlmodel import SQLModel, Field, Relationship, and_
 from pydantic import EmailStr
 
 
@@ -33,7 +34,7 @@ class Task(SQLModel, table=True):
     __tablename__ = "tasks"
     
     id: UUID = Field(default_factory=uuid4, primary_key=True)
-    user_id: UUID = Field(foreign_key="users.id", index=True)
+    user_id: UUID = Field(foreign_key="users.id")
     title: str = Field(min_length=1, max_length=200)
     description: Optional[str] = Field(default=None, max_length=2000)
     priority: str = Field(default="medium", max_length=10)
@@ -43,19 +44,95 @@ class Task(SQLModel, table=True):
     created_at: datetime = Field(default_factory=datetime.utcnow)
     updated_at: datetime = Field(default_factory=datetime.utcnow)
     deleted_at: Optional[datetime] = Field(default=None)
+    version: int = Field(default=1)  # bumped on every write, exposed as the ETag
     
     # Relationships
     user: Optional[User] = Relationship(back_populates="tasks")
 
 
+class UserTaskStats(SQLModel, table=True):
+    """Per-user task counters maintained incrementally on task writes"""
+    __tablename__ = "user_task_stats"
+    
+    user_id: UUID = Field(foreign_key="users.id", primary_key=True)
+    total: int = Field(default=0)
+    completed: int = Field(default=0)
+    low: int = Field(default=0)
+    medium: int = Field(default=0)
+    high: int = Field(default=0)
+    pending_low: int = Field(default=0)
+    pending_medium: int = Field(default=0)
+    pending_high: int = Field(default=0)
+    pending_with_due: int = Field(default=0)
+    last_task_created: Optional[datetime] = Field(default=None)
+    updated_at: datetime = Field(default_factory=datetime.utcnow)
+
+
+class TaskEvent(SQLModel, table=True):
+    """Transactional outbox of task changes awaiting realtime delivery"""
+    __tablename__ = "task_events"
+    
+    id: Optional[int] = Field(default=None, primary_key=True)
+    task_id: UUID
+    user_id: UUID
+    action: str = Field(max_length=20)
+    payload: str  # JSON-encoded event data
+    created_at: datetime = Field(default_factory=datetime.utcnow)
+    attempts: int = Field(default=0)  # failed publish attempts
+    next_attempt_at: Optional[datetime] = Field(default=None)  # retry backoff
+    dead_at: Optional[datetime] = Field(default=None)  # gave up after OUTBOX_MAX_ATTEMPTS
+
+
+# Dispatch walks live events in id order; dead-lettered ones stay out of it
+_live_event = TaskEvent.dead_at.is_(None)
+_dead_event = TaskEvent.dead_at.is_not(None)
+Index(
+    "ix_task_events_live", TaskEvent.id,
+    postgresql_where=_live_event, sqlite_where=_live_event,
+)
+# Retention purge of dead-lettered events
+Index(
+    "ix_task_events_dead_at", TaskEvent.dead_at,
+    postgresql_where=_dead_event, sqlite_where=_dead_event,
+)
+
+
+# Task indexes, shaped after the hot queries. Every one leads with user_id,
+# and the partial predicates are written with the same expressions the
+# queries use so both PostgreSQL and SQLite can match them.
+_active = Task.deleted_at.is_(None)
+_pending = and_(Task.completed.is_(False), Task.deleted_at.is_(None))
+
+# List pages and exports: ORDER BY created_at DESC, id DESC
+Index(
+    "ix_tasks_user_active_created",
+    Task.user_id, Task.created_at.desc(), Task.id.desc(),
+    postgresql_where=_active, sqlite_where=_active,
+)
+# Completion trends: completed_at ranges
+Index(
+    "ix_tasks_user_active_completed_at",
+    Task.user_id, Task.completed_at,
+    postgresql_where=_active, sqlite_where=_active,
+)
+# Overdue counts: pending tasks by due date
+Index(
+    "ix_tasks_user_pending_due",
+    Task.user_id, Task.due_date,
+    postgresql_where=_pending, sqlite_where=_pending,
+)
+# Delta sync: (updated_at, id) keyset, including soft-deleted rows
+Index("ix_tasks_user_updated_id", Task.user_id, Task.updated_at, Task.id)
+
+
 class Session(SQLModel, table=True):
     """Session/Token model"""
     __tablename__ = "sessions"
     
     id: UUID = Field(default_factory=uuid4, primary_key=True)
     user_id: UUID = Field(foreign_key="users.id", index=True)
-    access_token: str = Field(max_length=1024)
-    refresh_token: str = Field(max_length=1024)
+    access_jti: str = Field(max_length=36, index=True, unique=True)
+    refresh_jti: str = Field(max_length=36, index=True, unique=True)
     token_type: str = Field(default="Bearer", max_length=20)
     expires_at: datetime
     revoked_at: Optional[datetime] = Field(default=None, index=True)
@@ -125,6 +202,7 @@ class TaskRead(TaskBase):
     completed_at: Optional[datetime]
     created_at: datetime
     updated_at: datetime
+    version: int = 1
 
 
 class TaskCreate(TaskBase):
@@ -141,6 +219,18 @@ class TaskUpdate(SQLModel):
     completed: Optional[bool] = None
 
 
+class TaskBatchOperation(SQLModel):
+    """One set-based operation over several tasks"""
+    op: Literal["complete", "delete", "update"]
+    ids: list[UUID] = Field(min_length=1)
+    fields: Optional[TaskUpdate] = None
+
+
+class TaskBatchRequest(SQLModel):
+    """Batch of task operations applied in one transaction"""
+    operations: list[TaskBatchOperation] = Field(min_length=1)
+
+
 class AuthResponse(SQLModel):
     """Authentication response"""
     access_token: str
@@ -169,3 +259,53 @@ class UserStats(SQLModel):
     overdue_tasks: int
     last_task_created: Optional[datetime]
     last_login: Optional[datetime]
+
+
+# Full-text search over task title/description.
+# PostgreSQL: generated, weighted tsvector column with a GIN index, plus a
+# trigram index on title for type-ahead suggestions.
+# SQLite: external-content FTS5 table kept in sync by triggers.
+TASK_SEARCH_DDL = {
+    "postgresql": [
+        """ALTER TABLE tasks ADD COLUMN IF NOT EXISTS search_vector tsvector
+        GENERATED ALWAYS AS (
+            setweight(to_tsvector('english', coalesce(title, '')), 'A') ||
+            setweight(to_tsvector('english', coalesce(description, '')), 'B')
+        ) STORED""",
+        "CREATE INDEX IF NOT EXISTS ix_tasks_search_vector ON tasks USING GIN (search_vector)",
+        "CREATE EXTENSION IF NOT EXISTS pg_trgm",
+        "CREATE INDEX IF NOT EXISTS ix_tasks_title_trgm ON tasks USING GIN (title gin_trgm_ops)",
+    ],
+    "sqlite": [
+        """CREATE VIRTUAL TABLE IF NOT EXISTS tasks_fts USING fts5(
+            title, description, content='tasks', content_rowid='rowid'
+        )""",
+        """CREATE TRIGGER IF NOT EXISTS tasks_fts_insert AFTER INSERT ON tasks BEGIN
+            INSERT INTO tasks_fts(rowid, title, description)
+            VALUES (new.rowid, new.title, new.description);
+        END""",
+        """CREATE TRIGGER IF NOT EXISTS tasks_fts_delete AFTER DELETE ON tasks BEGIN
+            INSERT INTO tasks_fts(tasks_fts, rowid, title, description)
+            VALUES ('delete', old.rowid, old.title, old.description);
+        END""",
+        """CREATE TRIGGER IF NOT EXISTS tasks_fts_update AFTER UPDATE OF title, description ON tasks
+        BEGIN
+            INSERT INTO tasks_fts(tasks_fts, rowid, title, description)
+            VALUES ('delete', old.rowid, old.title, old.description);
+            INSERT INTO tasks_fts(rowid, title, description)
+            VALUES (new.rowid, new.title, new.description);
+        END""",
+    ],
+}
+
+for _dialect, _statements in TASK_SEARCH_DDL.items():
+    for _statement in _statements:
+        event.listen(
+            Task.__table__, "after_create", DDL(_statement).execute_if(dialect=_dialect)
+        )
+
+event.listen(
+    Task.__table__,
+    "after_drop",
+    DDL("DROP TABLE IF EXISTS tasks_fts").execute_if(dialect="sqlite"),
+)
@@ -0,0 +1,60 @@
+import time
+from collections import OrderedDict
+
+from src.config import settings
+from src.models.schemas import User
+
+
+class PrincipalCache:
+    """Bounded TTL/LRU cache of verified users keyed by token jti.
+
+    Entries expire at the earlier of the configured TTL and the token's own
+    ``exp``. The cache is per process, so a revocation made by another worker
+    is only observed here once the entry's TTL runs out.
+    """
+
+    def __init__(self, max_size: int, ttl: int):
+        self.max_size = max_size
+        self.ttl = ttl
+        self._entries: OrderedDict[str, tuple[User, float]] = OrderedDict()
+
+    def get(self, jti: str) -> User | None:
+        """Get cached user for a token id, dropping it if expired"""
+        entry = self._entries.get(jti)
+        if entry is None:
+            return None
+        user, expires_at = entry
+        if time.monotonic() >= expires_at:
+            del self._entries[jti]
+            return None
+        self._entries.move_to_end(jti)
+        return user
+
+    def set(self, jti: str, user: User, exp: int) -> None:
+        """Cache a detached copy of user until the TTL or token expiry"""
+        if self.max_size <= 0 or self.ttl <= 0:
+            return
+        remaining = min(self.ttl, exp - time.time())
+        if remaining <= 0:
+            return
+        snapshot = User.model_validate(user.model_dump())
+        self._entries[jti] = (snapshot, time.monotonic() + remaining)
+        self._entries.move_to_end(jti)
+        while len(self._entries) > self.max_size:
+            self._entries.popitem(last=False)
+
+    def invalidate(self, jti: str) -> None:
+        """Drop a single token"""
+        self._entries.pop(jti, None)
+
+    def clear(self) -> None:
+        self._entries.clear()
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+
+principal_cache = PrincipalCache(
+    max_size=settings.PRINCIPAL_CACHE_SIZE,
+    ttl=settings.PRINCIPAL_CACHE_TTL,
+)
@@ -1,13 +1,17 @@
+import asyncio
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime, timedelta, timezone
 from typing import Optional
-from uuid import UUID
+from uuid import UUID, uuid4
 from jose import jwt, JWTError
 from passlib.context import CryptContext
 from src.config import settings
 from src.models.schemas import User, TokenPayload
 
 # Password hashing
-pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
+pwd_context = CryptContext(
+    schemes=["bcrypt"], deprecated="auto", bcrypt__rounds=settings.BCRYPT_ROUNDS
+)
 
 
 def hash_password(password: str) -> str:
@@ -20,6 +24,50 @@ def verify_password(plain_password: str, hashed_password: str) -> bool:
     return pwd_context.verify(plain_password, hashed_password)
 
 
+# bcrypt releases the GIL, so a small thread pool keeps hashing off the event
+# loop while capping how many CPU-bound hashes run at once.
+_hash_executor = ThreadPoolExecutor(
+    max_workers=settings.PASSWORD_HASH_WORKERS, thread_name_prefix="password-hash"
+)
+_hash_stats = {"in_flight": 0, "max_queue_depth": 0, "completed": 0}
+
+
+async def _run_hash_job(func, *args):
+    """Run a hashing function on the password hash pool"""
+    _hash_stats["in_flight"] += 1
+    queue_depth = _hash_stats["in_flight"] - settings.PASSWORD_HASH_WORKERS
+    _hash_stats["max_queue_depth"] = max(_hash_stats["max_queue_depth"], queue_depth)
+    try:
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(_hash_executor, func, *args)
+    finally:
+        _hash_stats["in_flight"] -= 1
+        _hash_stats["completed"] += 1
+
+
+async def hash_password_async(password: str) -> str:
+    """Hash password without blocking the event loop"""
+    return await _run_hash_job(hash_password, password)
+
+
+async def verify_password_async(plain_password: str, hashed_password: str) -> bool:
+    """Verify password without blocking the event loop"""
+    return await _run_hash_job(verify_password, plain_password, hashed_password)
+
+
+def get_password_hash_stats() -> dict:
+    """Password hash pool usage for monitoring"""
+    in_flight = _hash_stats["in_flight"]
+    workers = settings.PASSWORD_HASH_WORKERS
+    return {
+        "workers": workers,
+        "running": min(in_flight, workers),
+        "queue_depth": max(in_flight - workers, 0),
+        "max_queue_depth": _hash_stats["max_queue_depth"],
+        "completed": _hash_stats["completed"],
+    }
+
+
 def create_access_token(user_id: UUID, email: str, name: str) -> str:
     """Create JWT access token"""
     now = datetime.now(timezone.utc)
@@ -33,7 +81,7 @@ def create_access_token(user_id: UUID, email: str, name: str) -> str:
         "exp": int(expires_at.timestamp()),
         "iss": "evolution-todo",
         "aud": "evolution-todo-api",
-        "jti": str(UUID(int=abs(hash(f"{user_id}{now}")) % (2**32))),
+        "jti": str(uuid4()),
     }
     
     token = jwt.encode(
@@ -53,7 +101,7 @@ def create_refresh_token(user_id: UUID) -> str:
         "iat": int(now.timestamp()),
         "exp": int(expires_at.timestamp()),
         "iss": "evolution-todo",
-        "jti": str(UUID(int=abs(hash(f"{user_id}{now}refresh")) % (2**32))),
+        "jti": str(uuid4()),
     }
     
     token = jwt.encode(
@@ -66,7 +114,10 @@ def verify_token(token: str) -> Optional[dict]:
     """Verify and decode JWT token"""
     try:
         payload = jwt.decode(
-            token, settings.JWT_SECRET, algorithms=[settings.JWT_ALGORITHM]
+            token,
+            settings.JWT_SECRET,
+            algorithms=[settings.JWT_ALGORITHM],
+            audience="evolution-todo-api",
         )
         return payload
     except JWTError:
@@ -77,3 +128,8 @@ def is_token_expired(exp: int) -> bool:
     """Check if token is expired"""
     now = datetime.now(timezone.utc)
     return now.timestamp() > exp
+
+
+def get_token_jti(token: str) -> str:
+    """Read the jti claim of a token issued by this service"""
+    return jwt.get_unverified_claims(token)["jti"]
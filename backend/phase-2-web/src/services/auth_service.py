@@ -1,13 +1,29 @@
+import json
+from types import SimpleNamespace
 from uuid import UUID
-from datetime import datetime
-from sqlalchemy import select, func
+from datetime import date, datetime, timedelta
+from sqlalchemy import select, func, text, or_, update
 from sqlmodel import Session, and_
-from src.models.schemas import User, Task, Session as SessionModel
-from src.security import hash_password, verify_password, create_access_token, create_refresh_token
-from src.db import async_session_factory
+from src.models.schemas import (
+    User, Task, UserTaskStats, TaskBatchOperation, Session as SessionModel
+)
+from src.security import (
+    hash_password_async, verify_password_async, create_access_token, create_refresh_token,
+    get_token_jti,
+)
+from src.config import settings
+from src.principal_cache import principal_cache
+from src.pagination import decode_cursor, encode_cursor
+from src.services.task_stats import TaskStatsService, task_contribution
+from src.services.search_service import suggestion_index
+from src.services.outbox import record_task_event
 from sqlalchemy.ext.asyncio import AsyncSession
 
 
+class TaskVersionConflict(ValueError):
+    """The task changed since the version the client last saw"""
+
+
 class AuthService:
     """Authentication service"""
     
@@ -26,7 +42,7 @@ class AuthService:
         user = User(
             email=email,
             name=name,
-            password_hash=hash_password(password),
+            password_hash=await hash_password_async(password),
         )
         session.add(user)
         await session.flush()
@@ -38,8 +54,8 @@ class AuthService:
         # Store session
         db_session = SessionModel(
             user_id=user.id,
-            access_token=access_token,
-            refresh_token=refresh_token,
+            access_jti=get_token_jti(access_token),
+            refresh_jti=get_token_jti(refresh_token),
             expires_at=datetime.utcnow() + __import__('datetime').timedelta(days=1),
         )
         session.add(db_session)
@@ -57,7 +73,7 @@ class AuthService:
         result = await session.execute(stmt)
         user = result.scalars().first()
         
-        if not user or not verify_password(password, user.password_hash):
+        if not user or not await verify_password_async(password, user.password_hash):
             raise ValueError("Invalid credentials")
         
         # Update last login
@@ -70,8 +86,8 @@ class AuthService:
         # Store session
         db_session = SessionModel(
             user_id=user.id,
-            access_token=access_token,
-            refresh_token=refresh_token,
+            access_jti=get_token_jti(access_token),
+            refresh_jti=get_token_jti(refresh_token),
             expires_at=datetime.utcnow() + __import__('datetime').timedelta(days=1),
         )
         session.add(db_session)
@@ -91,11 +107,18 @@ class AuthService:
             raise ValueError("Invalid token")
         
         user_id = UUID(payload.get("sub"))
+        jti = payload.get("jti")
+        if not jti:
+            raise ValueError("Invalid token")
+        
+        cached = principal_cache.get(jti)
+        if cached is not None and cached.id == user_id:
+            return cached
         
         # Verify session not revoked
         stmt = select(SessionModel).where(
             and_(
-                SessionModel.access_token == token,
+                SessionModel.access_jti == jti,
                 SessionModel.revoked_at.is_(None),
             )
         )
@@ -113,7 +136,69 @@ class AuthService:
         if not user:
             raise ValueError("User not found")
         
+        principal_cache.set(jti, user, payload["exp"])
         return user
+    
+    @staticmethod
+    async def refresh_access_token(
+        refresh_token: str, session: AsyncSession
+    ) -> str:
+        """Issue a new access token for a live refresh token"""
+        from src.security import verify_token
+        
+        payload = verify_token(refresh_token)
+        if not payload or payload.get("type") != "refresh" or not payload.get("jti"):
+            raise ValueError("Invalid refresh token")
+        
+        stmt = (
+            select(SessionModel, User)
+            .join(User, User.id == SessionModel.user_id)
+            .where(
+                and_(
+                    SessionModel.refresh_jti == payload["jti"],
+                    SessionModel.revoked_at.is_(None),
+                )
+            )
+        )
+        result = await session.execute(stmt)
+        row = result.first()
+        if not row:
+            raise ValueError("Session revoked")
+        db_session, user = row
+        
+        # Rotate the access token bound to this session
+        access_token = create_access_token(user.id, user.email, user.name)
+        principal_cache.invalidate(db_session.access_jti)
+        db_session.access_jti = get_token_jti(access_token)
+        db_session.updated_at = datetime.utcnow()
+        session.add(db_session)
+        await session.commit()
+        
+        return access_token
+    
+    @staticmethod
+    async def logout_user(token: str, session: AsyncSession) -> None:
+        """Revoke the session for an access token"""
+        from src.security import verify_token
+        
+        payload = verify_token(token)
+        if not payload or not payload.get("jti"):
+            return
+        
+        stmt = select(SessionModel).where(
+            and_(
+                SessionModel.access_jti == payload["jti"],
+                SessionModel.revoked_at.is_(None),
+            )
+        )
+        result = await session.execute(stmt)
+        db_session = result.scalars().first()
+        if db_session:
+            db_session.revoked_at = datetime.utcnow()
+            session.add(db_session)
+            await session.commit()
+        
+        principal_cache.invalidate(payload["jti"])
 
 
 class TaskService:
@@ -133,35 +218,141 @@ class TaskService:
             due_date=due_date,
         )
         session.add(task)
+        await TaskStatsService.apply_change(
+            user_id, {}, task_contribution(task), session, created_at=task.created_at
+        )
+        record_task_event(session, task, "created")
         await session.commit()
+        suggestion_index.invalidate(user_id)
         await session.refresh(task)
         return task
     
     @staticmethod
-    async def list_tasks(
-        user_id: UUID, completed: bool | None = None,
-        priority: str | None = None, session: AsyncSession | None = None
-    ) -> list[Task]:
-        """List tasks"""
-        if session is None:
-            async with async_session_factory() as session:
-                return await TaskService.list_tasks(user_id, completed, priority, session)
+    def _task_filters(
+        user_id: UUID, completed: bool | None = None, priority: str | None = None
+    ) -> list:
+        """Build WHERE clauses shared by list and count queries"""
+        filters = [Task.user_id == user_id, Task.deleted_at.is_(None)]
+        if completed is not None:
+            filters.append(Task.completed == completed)
+        if priority is not None:
+            filters.append(Task.priority == priority)
+        return filters
+    
+    @staticmethod
+    async def list_tasks_page(
+        user_id: UUID, session: AsyncSession, completed: bool | None = None,
+        priority: str | None = None, limit: int = 20, cursor: str | None = None,
+        offset: int | None = None,
+    ) -> tuple[list[Task], str | None]:
+        """List one page of tasks ordered by (created_at, id) descending.
         
-        stmt = select(Task).where(
-            and_(
-                Task.user_id == user_id,
-                Task.deleted_at.is_(None),
+        With ``cursor`` the page is fetched by keyset seek, otherwise by
+        ``offset``. One extra row is requested to detect whether a next page
+        exists; the returned cursor is None on the last page.
+        """
+        filters = TaskService._task_filters(user_id, completed, priority)
+        if cursor is not None:
+            created_at, task_id = decode_cursor(cursor)
+            filters.append(
+                or_(
+                    Task.created_at < created_at,
+                    and_(Task.created_at == created_at, Task.id < task_id),
+                )
             )
+        
+        stmt = (
+            select(Task)
+            .where(and_(*filters))
+            .order_by(Task.created_at.desc(), Task.id.desc())
+            .limit(limit + 1)
         )
+        if cursor is None and offset:
+            stmt = stmt.offset(offset)
         
-        if completed is not None:
-            stmt = stmt.where(Task.completed == completed)
-        if priority is not None:
-            stmt = stmt.where(Task.priority == priority)
+        result = await session.execute(stmt)
+        tasks = list(result.scalars().all())
+        
+        next_cursor = None
+        if len(tasks) > limit:
+            tasks = tasks[:limit]
+            last = tasks[-1]
+            next_cursor = encode_cursor(last.created_at, last.id)
+        return tasks, next_cursor
+    
+    @staticmethod
+    async def count_tasks(
+        user_id: UUID, session: AsyncSession, completed: bool | None = None,
+        priority: str | None = None, estimate: bool = False,
+    ) -> int:
+        """Count tasks matching the list filters.
+        
+        With ``estimate`` on PostgreSQL the planner's row estimate is returned
+        instead of running the COUNT; other dialects fall back to an exact count.
+        """
+        filters = TaskService._task_filters(user_id, completed, priority)
+        
+        if estimate and session.bind.dialect.name == "postgresql":
+            stmt = select(Task.id).where(and_(*filters))
+            compiled = stmt.compile(
+                dialect=session.bind.dialect, compile_kwargs={"literal_binds": True}
+            )
+            result = await session.execute(text(f"EXPLAIN (FORMAT JSON) {compiled}"))
+            plan = result.scalar()
+            if isinstance(plan, str):
+                plan = json.loads(plan)
+            return int(plan[0]["Plan"]["Plan Rows"])
+        
+        stmt = select(func.count()).select_from(Task).where(and_(*filters))
+        result = await session.execute(stmt)
+        return result.scalar_one()
+    
+    @staticmethod
+    async def list_changes(
+        user_id: UUID, session: AsyncSession, since: str | None = None, limit: int = 500,
+    ) -> tuple[list[Task], str, bool]:
+        """Tasks created, updated or soft-deleted after a sync watermark.
+        
+        Walks (updated_at, id) ascending and returns the changed tasks, the
+        next watermark and whether more changes are waiting. On the last
+        page the watermark stays SYNC_SAFETY_WINDOW_SECONDS behind now, so
+        late-committing writes are re-sent instead of skipped; clients
+        apply changes idempotently.
+        """
+        filters = [Task.user_id == user_id]
+        if since is not None:
+            updated_at, task_id = decode_cursor(since)
+            filters.append(
+                or_(
+                    Task.updated_at > updated_at,
+                    and_(Task.updated_at == updated_at, Task.id > task_id),
+                )
+            )
         
-        stmt = stmt.order_by(Task.created_at.desc())
+        stmt = (
+            select(Task)
+            .where(and_(*filters))
+            .order_by(Task.updated_at, Task.id)
+            .limit(limit + 1)
+        )
         result = await session.execute(stmt)
-        return result.scalars().all()
+        tasks = list(result.scalars().all())
+        
+        has_more = len(tasks) > limit
+        tasks = tasks[:limit]
+        
+        if tasks:
+            watermark = (tasks[-1].updated_at, tasks[-1].id)
+        elif since is not None:
+            watermark = decode_cursor(since)
+        else:
+            watermark = (datetime.min, UUID(int=0))
+        if not has_more:
+            horizon = datetime.utcnow() - timedelta(seconds=settings.SYNC_SAFETY_WINDOW_SECONDS)
+            if watermark[0] > horizon:
+                watermark = (horizon, UUID(int=0))
+        
+        return tasks, encode_cursor(*watermark), has_more
     
     @staticmethod
     async def get_task(
@@ -183,23 +374,87 @@ class TaskService:
         
         return task
     
+    @staticmethod
+    async def _update_returning(
+        task_id: UUID, user_id: UUID, values: dict, session: AsyncSession,
+        expected_versions: set[int] | None = None, action: str = "updated",
+    ) -> Task:
+        """Update an owned task and read it back with UPDATE ... RETURNING.
+        
+        On PostgreSQL the ownership check, the mutation, the read-back and
+        the pre-update counter columns come from a single statement. SQLite
+        cannot return columns of the joined row, so it snapshots them first.
+        With ``expected_versions`` the update only applies if the task is
+        still at one of those versions, otherwise TaskVersionConflict is
+        raised.
+        """
+        owned = and_(
+            Task.id == task_id,
+            Task.user_id == user_id,
+            Task.deleted_at.is_(None),
+        )
+        guarded = (
+            owned if expected_versions is None
+            else and_(owned, Task.version.in_(expected_versions))
+        )
+        values = {**values, "version": Task.version + 1}
+        counter_columns = [Task.completed, Task.priority, Task.due_date, Task.deleted_at]
+        
+        if session.bind.dialect.name == "postgresql":
+            old = select(Task.id, *counter_columns).where(guarded).with_for_update().subquery("old")
+            stmt = (
+                update(Task)
+                .where(Task.id == old.c.id)
+                .values(**values)
+                .returning(Task, *(old.c[c.key] for c in counter_columns))
+            )
+            row = (await session.execute(stmt)).first()
+            if row is None:
+                await TaskService._raise_missing(owned, expected_versions, session)
+            task, *old_values = row
+        else:
+            old_values = (await session.execute(select(*counter_columns).where(guarded))).first()
+            if old_values is None:
+                await TaskService._raise_missing(owned, expected_versions, session)
+            stmt = update(Task).where(guarded).values(**values).returning(Task)
+            task = (await session.execute(stmt)).scalar_one()
+        
+        before = task_contribution(
+            SimpleNamespace(**{c.key: v for c, v in zip(counter_columns, old_values)})
+        )
+        await TaskStatsService.apply_change(user_id, before, task_contribution(task), session)
+        record_task_event(session, task, action)
+        await session.commit()
+        return task
+    
+    @staticmethod
+    async def _raise_missing(
+        owned, expected_versions: set[int] | None, session: AsyncSession
+    ) -> None:
+        """Explain why a guarded update matched no row"""
+        if expected_versions is not None:
+            result = await session.execute(select(Task.id).where(owned))
+            if result.first() is not None:
+                raise TaskVersionConflict("Task has been modified")
+        raise ValueError("Task not found")
+    
     @staticmethod
     async def update_task(
-        task_id: UUID, user_id: UUID, **kwargs: dict
+        task_id: UUID, user_id: UUID, session: AsyncSession,
+        expected_versions: set[int] | None = None, **kwargs: dict
     ) -> Task:
         """Update task"""
-        async with async_session_factory() as session:
-            task = await TaskService.get_task(task_id, user_id, session)
-            
-            for key, value in kwargs.items():
-                if value is not None:
-                    setattr(task, key, value)
-            
-            task.updated_at = datetime.utcnow()
-            session.add(task)
-            await session.commit()
-            await session.refresh(task)
-            return task
+        values = {key: value for key, value in kwargs.items() if value is not None}
+        if "completed" in values:
+            values["completed_at"] = datetime.utcnow() if values["completed"] else None
+        values["updated_at"] = datetime.utcnow()
+        
+        task = await TaskService._update_returning(
+            task_id, user_id, values, session, expected_versions
+        )
+        if "title" in values:
+            suggestion_index.invalidate(user_id)
+        return task
     
     @staticmethod
     async def delete_task(
@@ -207,53 +462,193 @@ class TaskService:
     ) -> None:
         """Soft delete task"""
         task = await TaskService.get_task(task_id, user_id, session)
+        before = task_contribution(task)
         task.deleted_at = datetime.utcnow()
+        task.updated_at = task.deleted_at
+        task.version += 1
         session.add(task)
+        await TaskStatsService.apply_change(user_id, before, {}, session)
+        record_task_event(session, task, "deleted")
         await session.commit()
+        suggestion_index.invalidate(user_id)
     
     @staticmethod
     async def complete_task(
-        task_id: UUID, user_id: UUID, session: AsyncSession
+        task_id: UUID, user_id: UUID, session: AsyncSession,
+        expected_versions: set[int] | None = None,
     ) -> Task:
         """Mark task as complete"""
-        task = await TaskService.get_task(task_id, user_id, session)
-        task.completed = True
-        task.completed_at = datetime.utcnow()
-        task.updated_at = datetime.utcnow()
-        session.add(task)
+        now = datetime.utcnow()
+        values = {"completed": True, "completed_at": now, "updated_at": now}
+        return await TaskService._update_returning(
+            task_id, user_id, values, session, expected_versions, action="completed"
+        )
+    
+    @staticmethod
+    async def batch_mutate(
+        user_id: UUID, operations: list[TaskBatchOperation], session: AsyncSession
+    ) -> list[dict]:
+        """Apply complete/delete/update operations with set-based statements.
+        
+        Each operation reads the targeted rows' counter columns once, then
+        issues a single ``UPDATE ... WHERE id IN (...) AND user_id = ? RETURNING``
+        whose rows become the realtime events.
+        Everything commits together. Every id gets a status:
+        ``completed``/``deleted``/``updated``, ``unchanged`` when already in
+        the requested state, or ``not_found``.
+        """
+        now = datetime.utcnow()
+        before: dict[str, int] = {}
+        after: dict[str, int] = {}
+        results = []
+        
+        for operation in operations:
+            ids = list(dict.fromkeys(operation.ids))
+            stmt = (
+                select(Task.id, Task.completed, Task.priority, Task.due_date, Task.deleted_at)
+                .where(
+                    and_(
+                        Task.id.in_(ids),
+                        Task.user_id == user_id,
+                        Task.deleted_at.is_(None),
+                    )
+                )
+                .with_for_update()
+            )
+            tasks = {
+                row.id: SimpleNamespace(**row._mapping)
+                for row in (await session.execute(stmt)).all()
+            }
+            statuses = {str(task_id): "not_found" for task_id in ids if task_id not in tasks}
+            
+            if operation.op == "complete":
+                values = {"completed": True, "completed_at": now, "updated_at": now}
+                targets = [t for t in tasks.values() if not t.completed]
+                done = "completed"
+            elif operation.op == "delete":
+                values = {"deleted_at": now, "updated_at": now}
+                targets = list(tasks.values())
+                done = "deleted"
+            else:
+                fields = operation.fields.model_dump(exclude_unset=True) if operation.fields else {}
+                values = {k: v for k, v in fields.items() if v is not None}
+                if "completed" in values:
+                    values["completed_at"] = now if values["completed"] else None
+                targets = list(tasks.values()) if values else []
+                values["updated_at"] = now
+                done = "updated"
+            
+            for task in tasks.values():
+                statuses[str(task.id)] = "unchanged"
+            if targets:
+                for task in targets:
+                    for column, value in task_contribution(task).items():
+                        before[column] = before.get(column, 0) + value
+                    changed = SimpleNamespace(**{**vars(task), **values})
+                    for column, value in task_contribution(changed).items():
+                        after[column] = after.get(column, 0) + value
+                    statuses[str(task.id)] = done
+                
+                updated = await session.execute(
+                    update(Task)
+                    .where(
+                        and_(
+                            Task.id.in_([t.id for t in targets]),
+                            Task.user_id == user_id,
+                        )
+                    )
+                    .values(**values, version=Task.version + 1)
+                    .returning(Task)
+                )
+                for task in updated.scalars().all():
+                    record_task_event(session, task, done)
+            
+            results.append({"op": operation.op, "results": statuses})
+        
+        await TaskStatsService.apply_change(user_id, before, after, session)
         await session.commit()
-        await session.refresh(task)
-        return task
+        suggestion_index.invalidate(user_id)
+        return results
     
     @staticmethod
     async def get_user_stats(
         user_id: UUID, session: AsyncSession
     ) -> dict:
-        """Get user task statistics"""
-        stmt = select(Task).where(
-            and_(
-                Task.user_id == user_id,
-                Task.deleted_at.is_(None),
-            )
+        """Get user task statistics from the materialized counters"""
+        stmt = (
+            select(UserTaskStats, User.last_login_at)
+            .join(User, User.id == UserTaskStats.user_id)
+            .where(UserTaskStats.user_id == user_id)
         )
-        result = await session.execute(stmt)
-        tasks = result.scalars().all()
+        row = (await session.execute(stmt)).first()
+        if row is None:
+            stats = await TaskStatsService.get(user_id, session)
+            stmt = select(User.last_login_at).where(User.id == user_id)
+            last_login = (await session.execute(stmt)).scalar()
+        else:
+            stats, last_login = row
         
-        total = len(tasks)
-        completed = sum(1 for t in tasks if t.completed)
-        pending = total - completed
-        high_priority_pending = sum(
-            1 for t in tasks if t.priority == "high" and not t.completed
-        )
-        overdue = sum(
-            1 for t in tasks
-            if t.due_date and t.due_date < datetime.utcnow() and not t.completed
-        )
+        overdue = 0
+        if stats.pending_with_due:
+            stmt = select(func.count(Task.id)).where(
+                and_(
+                    Task.user_id == user_id,
+                    Task.deleted_at.is_(None),
+                    Task.completed.is_(False),
+                    Task.due_date < datetime.utcnow(),
+                )
+            )
+            overdue = (await session.execute(stmt)).scalar_one()
         
         return {
-            "total_tasks": total,
-            "completed_tasks": completed,
-            "pending_tasks": pending,
-            "high_priority_pending": high_priority_pending,
+            "total_tasks": stats.total,
+            "completed_tasks": stats.completed,
+            "pending_tasks": stats.total - stats.completed,
+            "high_priority_pending": stats.pending_high,
             "overdue_tasks": overdue,
+            "last_task_created": stats.last_task_created,
+            "last_login": last_login,
         }
+    
+    @staticmethod
+    async def get_completion_trends(
+        user_id: UUID, start: date, end: date, session: AsyncSession,
+        tz_offset_minutes: int = 0,
+    ) -> list[dict]:
+        """Count completed tasks per local day between start and end inclusive.
+        
+        Days are bucketed in SQL with one GROUP BY; ``tz_offset_minutes`` is
+        the client's offset from UTC (e.g. 120 for UTC+2). Days without
+        completions are zero-filled.
+        """
+        offset = timedelta(minutes=tz_offset_minutes)
+        range_start = datetime.combine(start, datetime.min.time()) - offset
+        range_end = datetime.combine(end + timedelta(days=1), datetime.min.time()) - offset
+        
+        if session.bind.dialect.name == "sqlite":
+            day = func.date(Task.completed_at, f"{tz_offset_minutes:+d} minutes")
+        else:
+            day = func.date(Task.completed_at + offset)
+        
+        stmt = (
+            select(day.label("day"), func.count(Task.id))
+            .where(
+                and_(
+                    Task.user_id == user_id,
+                    Task.completed_at >= range_start,
+                    Task.completed_at < range_end,
+                    Task.deleted_at.is_(None),
+                )
+            )
+            .group_by(day)
+        )
+        result = await session.execute(stmt)
+        counts = {str(row[0])[:10]: row[1] for row in result.all()}
+        
+        trends = []
+        current = start
+        while current <= end:
+            key = current.isoformat()
+            trends.append({"date": key, "completed": counts.get(key, 0)})
+            current += timedelta(days=1)
+        return trends
@@ -0,0 +1,85 @@
+import csv
+import io
+import json
+from typing import AsyncIterator
+from uuid import UUID
+from sqlalchemy import select, and_
+from sqlalchemy.ext.asyncio import async_sessionmaker
+
+from src.models.schemas import Task, TaskRead
+
+# Rows fetched per round trip from the server-side cursor and rendered per chunk
+EXPORT_CHUNK_ROWS = 500
+
+CSV_FIELDS = ["id", "title", "description", "priority", "completed", "due_date"]
+
+EXPORT_FORMATS = {
+    "csv": "text/csv",
+    "json": "application/json",
+    "ndjson": "application/x-ndjson",
+}
+
+
+def _csv_chunk(tasks: list[Task], header: bool) -> str:
+    output = io.StringIO()
+    writer = csv.DictWriter(output, fieldnames=CSV_FIELDS)
+    if header:
+        writer.writeheader()
+    for task in tasks:
+        writer.writerow({
+            "id": str(task.id),
+            "title": task.title,
+            "description": task.description or "",
+            "priority": task.priority,
+            "completed": task.completed,
+            "due_date": task.due_date or "",
+        })
+    return output.getvalue()
+
+
+def _json_records(tasks: list[Task]) -> list[str]:
+    return [
+        json.dumps(TaskRead.model_validate(t).model_dump(mode="json"))
+        for t in tasks
+    ]
+
+
+class ExportService:
+    """Streams a user's tasks in constant memory"""
+
+    @staticmethod
+    async def stream_tasks(
+        user_id: UUID, format: str, session_factory: async_sessionmaker
+    ) -> AsyncIterator[str]:
+        """Yield the export in chunks of EXPORT_CHUNK_ROWS tasks.
+
+        Rows come from a server-side cursor, so memory stays bounded by the
+        chunk size. The generator opens its own session because the response
+        body outlives the request's dependencies.
+        """
+        stmt = (
+            select(Task)
+            .where(and_(Task.user_id == user_id, Task.deleted_at.is_(None)))
+            .order_by(Task.created_at.desc(), Task.id.desc())
+            .execution_options(yield_per=EXPORT_CHUNK_ROWS)
+        )
+        async with session_factory() as session:
+            result = await session.stream_scalars(stmt)
+            first = True
+            if format == "json":
+                yield "["
+            elif format == "csv":
+                yield _csv_chunk([], header=True)
+
+            async for tasks in result.partitions(EXPORT_CHUNK_ROWS):
+                if format == "csv":
+                    yield _csv_chunk(tasks, header=False)
+                elif format == "json":
+                    chunk = ",".join(_json_records(tasks))
+                    yield chunk if first else "," + chunk
+                else:
+                    yield "".join(record + "\n" for record in _json_records(tasks))
+                first = False
+
+            if format == "json":
+                yield "]"
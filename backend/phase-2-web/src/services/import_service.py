@@ -0,0 +1,160 @@
+import csv
+import io
+import json
+from datetime import datetime
+from uuid import UUID, uuid4
+from pydantic import ValidationError
+from sqlalchemy import insert, select
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from src.models.schemas import Task, TaskCreate, UserTaskStats
+from src.services.outbox import record_task_event
+from src.services.task_stats import TaskStatsService, task_contribution
+from src.services.search_service import suggestion_index
+
+# Column limits of the tasks table, checked up front so one bad row cannot
+# abort the whole transaction
+FIELD_MAX_LENGTHS = {"title": 200, "description": 2000, "priority": 10}
+
+# Only reported up to this many row errors in the response
+MAX_REPORTED_ERRORS = 100
+
+COPY_COLUMNS = [
+    "id", "user_id", "title", "description", "priority", "due_date",
+    "completed", "completed_at", "created_at", "updated_at", "version",
+]
+
+
+def _parse_rows(format: str, body: bytes) -> list[tuple[int, dict | None, str | None]]:
+    """Split the body into (row number, raw row, parse error) tuples"""
+    text = body.decode("utf-8-sig")
+    if format == "csv":
+        rows = []
+        for number, row in enumerate(csv.DictReader(io.StringIO(text)), start=1):
+            # Empty CSV cells mean "not set", matching what export writes
+            rows.append((number, {k: v for k, v in row.items() if k and v != ""}, None))
+        return rows
+    if format == "json":
+        data = json.loads(text)
+        if not isinstance(data, list):
+            raise ValueError("JSON import must be an array of tasks")
+        return [(number, row, None) for number, row in enumerate(data, start=1)]
+
+    rows = []
+    for number, line in enumerate(text.splitlines(), start=1):
+        if not line.strip():
+            continue
+        try:
+            rows.append((number, json.loads(line), None))
+        except json.JSONDecodeError as e:
+            rows.append((number, None, f"invalid JSON: {e.msg}"))
+    return rows
+
+
+def _validate_row(raw: dict) -> tuple[TaskCreate | None, list[str]]:
+    if not isinstance(raw, dict):
+        return None, ["row must be an object"]
+    try:
+        data = TaskCreate.model_validate(raw)
+    except ValidationError as e:
+        return None, [
+            f"{'.'.join(str(part) for part in err['loc'])}: {err['msg']}" for err in e.errors()
+        ]
+
+    errors = []
+    if not data.title.strip():
+        errors.append("title: must not be empty")
+    for field, max_length in FIELD_MAX_LENGTHS.items():
+        value = getattr(data, field)
+        if value is not None and len(value) > max_length:
+            errors.append(f"{field}: must be at most {max_length} characters")
+    return (None, errors) if errors else (data, [])
+
+
+class ImportService:
+    """Bulk task import with batched inserts"""
+
+    @staticmethod
+    async def import_tasks(
+        user_id: UUID, format: str, body: bytes, session: AsyncSession, batch_size: int
+    ) -> dict:
+        """Validate every row, insert the valid ones in batches and commit once.
+
+        Invalid rows are skipped and reported by row number. On PostgreSQL
+        with asyncpg, batches are written with COPY; elsewhere with
+        multi-row INSERTs. All batches, the counter update and a "created"
+        outbox event per task share one transaction, so a failure part way
+        through leaves nothing behind.
+        """
+        now = datetime.utcnow()
+        tasks = []
+        records = []
+        errors = []
+        delta: dict[str, int] = {}
+
+        for number, raw, parse_error in _parse_rows(format, body):
+            if parse_error:
+                errors.append({"row": number, "errors": [parse_error]})
+                continue
+            data, row_errors = _validate_row(raw)
+            if row_errors:
+                errors.append({"row": number, "errors": row_errors})
+                continue
+
+            task = Task(
+                id=uuid4(),
+                user_id=user_id,
+                title=data.title,
+                description=data.description,
+                priority=data.priority,
+                due_date=data.due_date,
+                completed=data.completed,
+                completed_at=now if data.completed else None,
+                created_at=now,
+                updated_at=now,
+                version=1,
+            )
+            tasks.append(task)
+            records.append({column: getattr(task, column) for column in COPY_COLUMNS})
+            for column, value in task_contribution(task).items():
+                delta[column] = delta.get(column, 0) + value
+
+        use_copy = session.bind.dialect.driver == "asyncpg" and bool(records)
+        if use_copy:
+            # asyncpg's adapter only opens its transaction on the first
+            # statement and raw COPY does not count, so batches would each
+            # autocommit. Locking the counters row starts the transaction
+            # and also serializes concurrent imports for the same user.
+            await session.execute(
+                select(UserTaskStats.user_id)
+                .where(UserTaskStats.user_id == user_id)
+                .with_for_update()
+            )
+        for start in range(0, len(records), batch_size):
+            batch = records[start:start + batch_size]
+            if use_copy:
+                connection = await session.connection()
+                raw = await connection.get_raw_connection()
+                await raw.driver_connection.copy_records_to_table(
+                    Task.__tablename__,
+                    records=[tuple(r[c] for c in COPY_COLUMNS) for r in batch],
+                    columns=COPY_COLUMNS,
+                )
+            else:
+                await session.execute(insert(Task), batch)
+
+        for task in tasks:
+            record_task_event(session, task, "created")
+        if records:
+            await TaskStatsService.apply_change(
+                user_id, {}, delta, session, created_at=now
+            )
+        await session.commit()
+        if records:
+            suggestion_index.invalidate(user_id)
+
+        return {
+            "imported": len(records),
+            "failed": len(errors),
+            "errors": errors[:MAX_REPORTED_ERRORS],
+        }
@@ -0,0 +1,183 @@
+import asyncio
+import json
+import logging
+import time
+from datetime import datetime, timedelta
+from typing import Awaitable, Callable, Iterable
+from uuid import UUID
+
+from sqlalchemy import event, select, delete, or_, update
+from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker
+from sqlalchemy.orm import Session as OrmSession
+from pydantic_core import to_jsonable_python
+
+from src.config import settings
+from src.models.schemas import Task, TaskEvent, TaskRead
+
+logger = logging.getLogger(__name__)
+
+Publisher = Callable[[TaskEvent], Awaitable[None]]
+
+# Seconds between purges of expired dead-lettered events
+PURGE_INTERVAL = 3600.0
+
+
+def record_task_event(session: AsyncSession, task: Task, action: str) -> None:
+    """Queue a realtime event for a task in the caller's transaction"""
+    data = {} if action == "deleted" else TaskRead.model_validate(task).model_dump(mode="json")
+    record_task_events(session, [task.id], task.user_id, action, data)
+
+
+def record_task_events(
+    session: AsyncSession, task_ids: Iterable[UUID], user_id: UUID, action: str, data: dict
+) -> None:
+    """Queue the same event for several tasks in the caller's transaction"""
+    payload = json.dumps(to_jsonable_python(data))
+    session.add_all([
+        TaskEvent(task_id=task_id, user_id=user_id, action=action, payload=payload)
+        for task_id in task_ids
+    ])
+    session.info["outbox_pending"] = True
+
+
+class OutboxDispatcher:
+    """Moves committed task events to the realtime layer.
+
+    Polls task_events in id order, publishes a batch, then deletes it in
+    the same transaction, so delivery is at least once. On PostgreSQL rows
+    are claimed with SKIP LOCKED and several workers can dispatch at once.
+    Commits in this process that wrote events wake the dispatcher early.
+
+    An event whose publish fails is retried with exponential backoff while
+    later events carry on; after ``max_attempts`` failures it is kept with
+    ``dead_at`` set and no longer retried. Dead events are deleted once
+    they are older than OUTBOX_DEAD_RETENTION, checked every PURGE_INTERVAL.
+    """
+
+    def __init__(
+        self,
+        session_factory: async_sessionmaker,
+        publish: Publisher,
+        batch_size: int | None = None,
+        poll_interval: float | None = None,
+        max_attempts: int | None = None,
+    ):
+        # Defaults are read here, not at import, so overridden settings apply
+        self.session_factory = session_factory
+        self.publish = publish
+        self.batch_size = batch_size if batch_size is not None else settings.OUTBOX_BATCH_SIZE
+        self.poll_interval = (
+            poll_interval if poll_interval is not None else settings.OUTBOX_POLL_INTERVAL
+        )
+        self.max_attempts = (
+            max_attempts if max_attempts is not None else settings.OUTBOX_MAX_ATTEMPTS
+        )
+        self._wake: asyncio.Event | None = None
+        self._task: asyncio.Task | None = None
+        self._purged_at: float | None = None
+
+    async def start(self) -> None:
+        self._wake = asyncio.Event()
+        self._task = asyncio.create_task(self._run())
+        _dispatchers.add(self)
+
+    async def stop(self) -> None:
+        _dispatchers.discard(self)
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+    def wake(self) -> None:
+        if self._wake is not None:
+            self._wake.set()
+
+    async def _run(self) -> None:
+        while True:
+            try:
+                while await self.dispatch_once() == self.batch_size:
+                    pass
+            except Exception as e:
+                logger.error(f"Outbox dispatch failed: {e}")
+            if self._purged_at is None or time.monotonic() - self._purged_at >= PURGE_INTERVAL:
+                try:
+                    await self.purge_dead()
+                    self._purged_at = time.monotonic()
+                except Exception as e:
+                    logger.error(f"Outbox purge failed: {e}")
+            try:
+                await asyncio.wait_for(self._wake.wait(), self.poll_interval)
+            except asyncio.TimeoutError:
+                pass
+            self._wake.clear()
+
+    async def dispatch_once(self) -> int:
+        """Publish one batch of due events; returns how many were claimed"""
+        now = datetime.utcnow()
+        async with self.session_factory() as session:
+            stmt = (
+                select(TaskEvent)
+                .where(
+                    TaskEvent.dead_at.is_(None),
+                    or_(TaskEvent.next_attempt_at.is_(None), TaskEvent.next_attempt_at <= now),
+                )
+                .order_by(TaskEvent.id)
+                .limit(self.batch_size)
+                .with_for_update(skip_locked=True)
+            )
+            events = (await session.execute(stmt)).scalars().all()
+            if not events:
+                return 0
+            
+            delivered = []
+            for task_event in events:
+                try:
+                    await self.publish(task_event)
+                except Exception as e:
+                    await self._record_failure(session, task_event, e, now)
+                else:
+                    delivered.append(task_event.id)
+            if delivered:
+                await session.execute(delete(TaskEvent).where(TaskEvent.id.in_(delivered)))
+            await session.commit()
+        return len(events)
+
+    async def purge_dead(self) -> int:
+        """Delete dead-lettered events past their retention; returns how many"""
+        cutoff = datetime.utcnow() - timedelta(seconds=settings.OUTBOX_DEAD_RETENTION)
+        async with self.session_factory() as session:
+            result = await session.execute(
+                delete(TaskEvent).where(TaskEvent.dead_at.is_not(None), TaskEvent.dead_at < cutoff)
+            )
+            await session.commit()
+        if result.rowcount:
+            logger.info(f"Purged {result.rowcount} dead-lettered outbox events")
+        return result.rowcount
+
+    async def _record_failure(
+        self, session: AsyncSession, task_event: TaskEvent, error: Exception, now: datetime
+    ) -> None:
+        attempts = task_event.attempts + 1
+        values = {"attempts": attempts}
+        if attempts >= self.max_attempts:
+            values["dead_at"] = now
+            logger.error(f"Outbox event {task_event.id} dead-lettered after {attempts} attempts: {error}")
+        else:
+            values["next_attempt_at"] = now + timedelta(seconds=min(2 ** attempts, 300))
+            logger.warning(f"Outbox event {task_event.id} publish failed, will retry: {error}")
+        await session.execute(
+            update(TaskEvent).where(TaskEvent.id == task_event.id).values(**values)
+        )
+
+
+_dispatchers: set[OutboxDispatcher] = set()
+
+
+@event.listens_for(OrmSession, "after_commit")
+def _wake_dispatchers(session):
+    if session.info.pop("outbox_pending", False):
+        for dispatcher in _dispatchers:
+            dispatcher.wake()
@@ -0,0 +1,203 @@
+import re
+import time
+from bisect import bisect_left
+from collections import OrderedDict
+from datetime import datetime
+from uuid import UUID
+from sqlalchemy import String, select, func, and_, literal_column, table, column, text, values
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from src.config import settings
+from src.models.schemas import Task
+
+_TERM = re.compile(r"\w+", re.UNICODE)
+_tasks_fts = table("tasks_fts", column("rowid"))
+
+
+def search_terms(q: str) -> list[str]:
+    """Split a user query into plain word terms"""
+    return _TERM.findall(q.lower())
+
+
+def _like_escape(value: str) -> str:
+    return value.replace("\\", "\\\\").replace("%", "\\%").replace("_", "\\_")
+
+
+class _UserTitles:
+    """Sorted word-start suffixes over one user's distinct task titles"""
+
+    def __init__(self, rows: list[tuple[str, int, datetime | None]]):
+        self.titles = [
+            (title, frequency, last_used.timestamp() if last_used else 0.0)
+            for title, frequency, last_used in rows
+        ]
+        keys = []
+        for idx, (title, _, _) in enumerate(self.titles):
+            lower = title.lower()
+            keys.extend((lower[m.start():], idx) for m in _TERM.finditer(lower))
+        keys.sort()
+        self.keys = keys
+        self.built_at = time.monotonic()
+
+    def match(self, prefix: str, limit: int) -> list[str]:
+        """Titles with a word starting with prefix, whole-title prefixes first,
+        then by how often the title is used and how recently"""
+        prefix = prefix.lower()
+        hits = set()
+        i = bisect_left(self.keys, (prefix,))
+        while i < len(self.keys) and self.keys[i][0].startswith(prefix):
+            hits.add(self.keys[i][1])
+            i += 1
+        ranked = sorted(
+            hits,
+            key=lambda idx: (
+                not self.titles[idx][0].lower().startswith(prefix),
+                -self.titles[idx][1],
+                -self.titles[idx][2],
+            ),
+        )
+        return [self.titles[idx][0] for idx in ranked[:limit]]
+
+
+class SuggestionIndex:
+    """Per-user in-memory prefix index with LRU eviction and a TTL"""
+
+    def __init__(self, max_users: int, ttl: int):
+        self.max_users = max_users
+        self.ttl = ttl
+        self._users: OrderedDict[UUID, _UserTitles] = OrderedDict()
+
+    async def lookup(self, user_id: UUID, session: AsyncSession) -> _UserTitles:
+        """Get a user's index, building it from the tasks table if missing or stale"""
+        index = self._users.get(user_id)
+        if index is not None and time.monotonic() - index.built_at < self.ttl:
+            self._users.move_to_end(user_id)
+            return index
+
+        stmt = (
+            select(Task.title, func.count(Task.id), func.max(Task.updated_at))
+            .where(Task.user_id == user_id, Task.deleted_at.is_(None))
+            .group_by(Task.title)
+        )
+        result = await session.execute(stmt)
+        index = _UserTitles(result.all())
+        self._users[user_id] = index
+        self._users.move_to_end(user_id)
+        while len(self._users) > self.max_users:
+            self._users.popitem(last=False)
+        return index
+
+    def invalidate(self, user_id: UUID) -> None:
+        self._users.pop(user_id, None)
+
+
+suggestion_index = SuggestionIndex(
+    max_users=settings.SUGGESTION_CACHE_USERS,
+    ttl=settings.SUGGESTION_CACHE_TTL,
+)
+
+
+class SearchService:
+    """Task search backed by the database's full-text index"""
+
+    @staticmethod
+    async def search_tasks(
+        user_id: UUID, q: str, session: AsyncSession,
+        priority: str | None = None, completed: bool | None = None,
+        limit: int = 20, offset: int = 0,
+    ) -> tuple[list[Task], int]:
+        """Rank the user's tasks against q and return one page plus the total.
+
+        Every term must match; the last term also matches as a prefix so
+        results keep up while the user is typing.
+        """
+        terms = search_terms(q)
+        if not terms:
+            return [], 0
+
+        filters = [Task.user_id == user_id, Task.deleted_at.is_(None)]
+        if priority is not None:
+            filters.append(Task.priority == priority)
+        if completed is not None:
+            filters.append(Task.completed == completed)
+
+        total = func.count().over().label("total")
+
+        if session.bind.dialect.name == "postgresql":
+            tsquery = func.to_tsquery(
+                "english", " & ".join(terms[:-1] + [f"{terms[-1]}:*"])
+            )
+            vector = literal_column("tasks.search_vector")
+            rank = func.ts_rank(vector, tsquery)
+            stmt = (
+                select(Task, total)
+                .where(and_(vector.op("@@")(tsquery), *filters))
+                .order_by(rank.desc(), Task.created_at.desc())
+            )
+        else:
+            # build_db_url only produces PostgreSQL or SQLite URLs
+            match = " ".join(f'"{t}"' for t in terms[:-1]) + f' "{terms[-1]}"*'
+            stmt = (
+                select(Task, total)
+                .join(_tasks_fts, literal_column("tasks_fts.rowid") == literal_column("tasks.rowid"))
+                .where(and_(text("tasks_fts MATCH :match").bindparams(match=match), *filters))
+                .order_by(literal_column("tasks_fts.rank"), Task.created_at.desc())
+            )
+
+        result = await session.execute(stmt.limit(limit).offset(offset))
+        rows = result.all()
+        if rows:
+            return [row[0] for row in rows], rows[0][1]
+        if offset:
+            # Past the last page: the window total is unavailable, count directly
+            count = select(func.count()).select_from(stmt.subquery())
+            return [], (await session.execute(count)).scalar_one()
+        return [], 0
+
+    @staticmethod
+    async def suggest(
+        user_id: UUID, prefixes: list[str], session: AsyncSession, limit: int = 5
+    ) -> dict[str, list[str]]:
+        """Title suggestions for each prefix, ranked by prefix fit, frequency
+        and recency. Several prefixes (e.g. debounced keystrokes) can be
+        answered in one call."""
+        if session.bind.dialect.name != "postgresql":
+            index = await suggestion_index.lookup(user_id, session)
+            return {prefix: index.match(prefix, limit) for prefix in prefixes}
+
+        suggestions = {prefix: [] for prefix in prefixes}
+        if not suggestions:
+            return suggestions
+
+        # All prefixes in one round trip: join a VALUES list of patterns to
+        # the user's titles and keep the top ``limit`` per prefix
+        patterns = values(
+            column("prefix", String), column("contains", String), column("starts", String),
+            name="prefixes",
+        ).data([
+            (prefix, f"%{_like_escape(prefix)}%", f"{_like_escape(prefix)}%")
+            for prefix in suggestions
+        ])
+        position = func.row_number().over(
+            partition_by=patterns.c.prefix,
+            order_by=(
+                Task.title.ilike(patterns.c.starts, escape="\\").desc(),
+                func.count(Task.id).desc(),
+                func.max(Task.updated_at).desc(),
+            ),
+        ).label("position")
+        ranked = (
+            select(patterns.c.prefix, Task.title, position)
+            .join_from(patterns, Task, Task.title.ilike(patterns.c.contains, escape="\\"))
+            .where(Task.user_id == user_id, Task.deleted_at.is_(None))
+            .group_by(patterns.c.prefix, patterns.c.starts, Task.title)
+            .subquery()
+        )
+        result = await session.execute(
+            select(ranked.c.prefix, ranked.c.title)
+            .where(ranked.c.position <= limit)
+            .order_by(ranked.c.prefix, ranked.c.position)
+        )
+        for prefix, title in result.all():
+            suggestions[prefix].append(title)
+        return suggestions
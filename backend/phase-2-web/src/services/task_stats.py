@@ -0,0 +1,175 @@
+import asyncio
+from uuid import UUID
+from datetime import datetime
+from sqlalchemy import select, func, delete, update, literal
+from sqlalchemy.dialects import postgresql, sqlite
+from sqlmodel import and_
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from src.models.schemas import Task, UserTaskStats
+
+PRIORITIES = ("low", "medium", "high")
+
+COUNTER_COLUMNS = (
+    "total", "completed",
+    *PRIORITIES,
+    *(f"pending_{p}" for p in PRIORITIES),
+    "pending_with_due",
+)
+
+STORED_COLUMNS = (*COUNTER_COLUMNS, "last_task_created", "updated_at")
+
+
+def task_contribution(task: Task | None) -> dict[str, int]:
+    """Counters a single task contributes to its owner's stats row"""
+    if task is None or task.deleted_at is not None:
+        return {}
+
+    counters = {"total": 1}
+    if task.completed:
+        counters["completed"] = 1
+    if task.priority in PRIORITIES:
+        counters[task.priority] = 1
+        if not task.completed:
+            counters[f"pending_{task.priority}"] = 1
+    if not task.completed and task.due_date is not None:
+        counters["pending_with_due"] = 1
+    return counters
+
+
+class TaskStatsService:
+    """Maintains the user_task_stats counter table"""
+
+    @staticmethod
+    async def apply_change(
+        user_id: UUID, before: dict[str, int], after: dict[str, int],
+        session: AsyncSession, created_at: datetime | None = None,
+    ) -> None:
+        """Apply the difference between two task contributions.
+
+        Runs inside the caller's transaction. If the user has no stats row
+        yet it is seeded from the tasks table with an upsert, so concurrent
+        first writes cannot collide on the primary key.
+        """
+        values = {}
+        for column in COUNTER_COLUMNS:
+            diff = after.get(column, 0) - before.get(column, 0)
+            if diff:
+                values[column] = getattr(UserTaskStats, column) + diff
+        if created_at is not None:
+            values["last_task_created"] = created_at
+        if not values:
+            return
+        values["updated_at"] = datetime.utcnow()
+
+        stmt = update(UserTaskStats).where(UserTaskStats.user_id == user_id).values(values)
+        result = await session.execute(stmt)
+        if result.rowcount == 0:
+            # First write for this user: seed the row from the tasks table,
+            # which already includes this change once flushed. If another
+            # transaction created the row meanwhile, its counters lack this
+            # change, so add the difference to them instead.
+            await session.flush()
+            upsert = _insert(session).from_select(
+                ["user_id", *STORED_COLUMNS], _aggregate_select(user_id)
+            )
+            await session.execute(
+                upsert.on_conflict_do_update(index_elements=["user_id"], set_=values)
+            )
+
+    @staticmethod
+    async def get(user_id: UUID, session: AsyncSession) -> UserTaskStats:
+        """Get a user's counters.
+
+        Never writes, so it is safe on a read replica: if the user has no
+        row yet the counters are computed from the tasks table and returned
+        unsaved. The row itself is created by the next task write.
+        """
+        stats = await session.get(UserTaskStats, user_id)
+        if stats is None:
+            result = await session.execute(_aggregate_select(user_id))
+            row = result.first()
+            if row is None:
+                return UserTaskStats(user_id=user_id)
+            stats = UserTaskStats(**dict(zip(["user_id", *STORED_COLUMNS], row)))
+        return stats
+
+    @staticmethod
+    async def rebuild(session: AsyncSession, user_id: UUID | None = None) -> None:
+        """Recompute counters from the tasks table for one user or everyone.
+
+        Rows are upserted rather than deleted and re-inserted, so a rebuild
+        can race a user's first task write. Does not commit; callers own
+        the transaction.
+        """
+        await session.flush()
+
+        upsert = _insert(session).from_select(
+            ["user_id", *STORED_COLUMNS], _aggregate_select(user_id)
+        )
+        result = await session.execute(
+            upsert.on_conflict_do_update(
+                index_elements=["user_id"],
+                set_={column: upsert.excluded[column] for column in STORED_COLUMNS},
+            )
+        )
+
+        if user_id is not None:
+            if result.rowcount == 0:
+                empty = _insert(session).values(
+                    user_id=user_id, **{column: 0 for column in COUNTER_COLUMNS},
+                    last_task_created=None, updated_at=datetime.utcnow(),
+                )
+                await session.execute(
+                    empty.on_conflict_do_update(
+                        index_elements=["user_id"],
+                        set_={column: empty.excluded[column] for column in STORED_COLUMNS},
+                    )
+                )
+            return
+
+        live_owners = select(Task.user_id).where(Task.deleted_at.is_(None))
+        await session.execute(
+            delete(UserTaskStats).where(UserTaskStats.user_id.not_in(live_owners))
+        )
+
+
+def _insert(session: AsyncSession):
+    """INSERT for the session's dialect, which supports ON CONFLICT upserts"""
+    dialect = postgresql if session.bind.dialect.name == "postgresql" else sqlite
+    return dialect.insert(UserTaskStats)
+
+
+def _aggregate_select(user_id: UUID | None = None):
+    """Per-user counters computed from the tasks table"""
+    pending = Task.completed.is_(False)
+    stmt = (
+        select(
+            Task.user_id,
+            func.count(Task.id),
+            func.count(Task.id).filter(Task.completed.is_(True)),
+            *(func.count(Task.id).filter(Task.priority == p) for p in PRIORITIES),
+            *(func.count(Task.id).filter(and_(pending, Task.priority == p)) for p in PRIORITIES),
+            func.count(Task.id).filter(and_(pending, Task.due_date.is_not(None))),
+            func.max(Task.created_at),
+            literal(datetime.utcnow(), UserTaskStats.updated_at.type),
+        )
+        .where(Task.deleted_at.is_(None))
+        .group_by(Task.user_id)
+    )
+    if user_id is not None:
+        stmt = stmt.where(Task.user_id == user_id)
+    return stmt
+
+
+async def reconcile_all() -> None:
+    """Rebuild every user's counters from scratch"""
+    from src.db import async_session_factory
+
+    async with async_session_factory() as session:
+        await TaskStatsService.rebuild(session)
+        await session.commit()
+
+
+if __name__ == "__main__":
+    asyncio.run(reconcile_all())
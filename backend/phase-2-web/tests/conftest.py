@@ -7,7 +7,7 @@ from sqlalchemy.ext.asyncio import AsyncSession, create_async_engine, async_sess
 from httpx import AsyncClient, ASGITransport
 
 from src.main import app
-from src.db import get_session
+from src.db import get_session, get_session_factory, get_read_session, get_read_session_factory
 
 
 @pytest.fixture(scope="session")
@@ -50,8 +50,26 @@ async def client(async_session_local):
             yield session
     
     app.dependency_overrides[get_session] = override_get_session
+    app.dependency_overrides[get_read_session] = override_get_session
+    app.dependency_overrides[get_read_session_factory] = lambda: async_session_local
+    app.dependency_overrides[get_session_factory] = lambda: async_session_local
     transport = ASGITransport(app=app)
     async with AsyncClient(transport=transport, base_url="http://test") as client:
         yield client
     app.dependency_overrides.clear()
 
+
+@pytest_asyncio.fixture
+async def session_tokens(client):
+    """Register a user and return the tokens of its new session"""
+    response = await client.post(
+        "/api/v1/auth/register",
+        json={"email": "user@example.com", "password": "Password123", "name": "Test User"},
+    )
+    return response.json()["session"]
+
+
+@pytest.fixture
+def auth(session_tokens):
+    """Query params authenticating requests as the registered user"""
+    return {"authorization": f"Bearer {session_tokens['access_token']}"}
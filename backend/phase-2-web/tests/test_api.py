@@ -1,5 +1,6 @@
 """API endpoint tests"""
 import pytest
+from uuid import uuid4
 from httpx import AsyncClient
 
 
@@ -19,3 +20,351 @@ async def test_root_redirect(client: AsyncClient):
     # Root may redirect or return 200
     assert response.status_code in [200, 307, 308]
 
+
+
+@pytest.mark.asyncio
+async def test_analytics_dashboard(async_session_local):
+    """Test analytics handlers aggregate tasks in grouped queries"""
+    from src.api.v1 import analytics
+    from src.main import app
+    from src.models.schemas import User, Task
+    
+    assert "/api/v1/analytics/dashboard" in {route.path for route in app.routes}
+    
+    async with async_session_local() as session:
+        user = User(email="analytics@example.com", name="Ana", password_hash="x")
+        session.add(user)
+        for priority in ["high", "high", "low"]:
+            session.add(Task(user_id=user.id, title="t", priority=priority))
+        await session.commit()
+        
+        dashboard = await analytics.get_dashboard_stats(current_user=user, session=session)
+        distribution = await analytics.get_priority_distribution(current_user=user, session=session)
+    
+    assert dashboard["stats"]["total_tasks"] == 3
+    assert dashboard["stats"]["high_priority_pending"] == 2
+    assert distribution["distribution"] == {"low": 1, "medium": 0, "high": 2}
+
+
+@pytest.mark.asyncio
+async def test_logout_invalidates_cached_principal(client: AsyncClient, auth):
+    """Test cached principals are dropped on logout"""
+    from src.principal_cache import principal_cache
+    
+    size = len(principal_cache)
+    assert (await client.get("/api/v1/auth/me", params=auth)).status_code == 200
+    assert len(principal_cache) == size + 1
+    assert (await client.get("/api/v1/auth/me", params=auth)).status_code == 200
+    
+    assert (await client.post("/api/v1/auth/logout", params=auth)).status_code == 200
+    assert len(principal_cache) == size
+    assert (await client.get("/api/v1/auth/me", params=auth)).status_code == 401
+
+
+@pytest.mark.asyncio
+async def test_refresh_rotates_session_access_token(client: AsyncClient, session_tokens):
+    """Test refresh looks the session up by jti and rotates the access token"""
+    old_auth = {"authorization": f"Bearer {session_tokens['access_token']}"}
+    assert (await client.get("/api/v1/auth/me", params=old_auth)).status_code == 200
+    
+    response = await client.post(
+        "/api/v1/auth/refresh", json={"refresh_token": session_tokens["refresh_token"]}
+    )
+    assert response.status_code == 200
+    new_auth = {"authorization": f"Bearer {response.json()['access_token']}"}
+    
+    assert (await client.get("/api/v1/auth/me", params=new_auth)).status_code == 200
+    assert (await client.get("/api/v1/auth/me", params=old_auth)).status_code == 401
+    
+    response = await client.post(
+        "/api/v1/auth/refresh", json={"refresh_token": session_tokens["access_token"]}
+    )
+    assert response.status_code == 401
+
+
+@pytest.mark.asyncio
+async def test_search_tasks_full_text(client: AsyncClient, auth):
+    """Test search uses the full-text index with ranking and prefix matching"""
+    for title, description in [
+        ("Buy groceries", "milk and bread"),
+        ("Call plumber", "kitchen sink leaking, groceries later"),
+        ("Write report", None),
+    ]:
+        await client.post(
+            "/api/v1/tasks", params=auth, json={"title": title, "description": description}
+        )
+    
+    response = await client.get("/api/v1/search/tasks", params={**auth, "q": "grocer"})
+    data = response.json()
+    assert response.status_code == 200
+    assert data["total"] == 2
+    assert data["results"][0]["title"] == "Buy groceries"
+    
+    response = await client.get("/api/v1/search/tasks", params={**auth, "q": "report!"})
+    assert [r["title"] for r in response.json()["results"]] == ["Write report"]
+
+
+@pytest.mark.asyncio
+async def test_search_suggestions_prefix_ranking(client: AsyncClient, auth):
+    """Test suggestions match word prefixes, rank by frequency and batch prefixes"""
+    for title in ["Water plants", "Walk dog", "Walk dog", "Go for a walk", "Read"]:
+        await client.post("/api/v1/tasks", params=auth, json={"title": title})
+    
+    response = await client.get(
+        "/api/v1/search/suggestions", params=[*auth.items(), ("q", "w"), ("q", "wal")]
+    )
+    data = response.json()
+    assert response.status_code == 200
+    assert data["suggestions"] == ["Walk dog", "Go for a walk"]
+    assert set(data["batch"]["w"]) == {"Water plants", "Walk dog", "Go for a walk"}
+    assert data["batch"]["w"][0] == "Walk dog"
+
+
+@pytest.mark.asyncio
+async def test_export_streams_all_formats(client: AsyncClient, auth, monkeypatch):
+    """Test exports stream every task across several chunks"""
+    import csv
+    import io
+    import json
+    from src.services import export_service
+    
+    monkeypatch.setattr(export_service, "EXPORT_CHUNK_ROWS", 2)
+    for i in range(5):
+        await client.post("/api/v1/tasks", params=auth, json={"title": f"task {i}"})
+    
+    response = await client.get("/api/v1/tasks/export/csv", params=auth)
+    rows = list(csv.DictReader(io.StringIO(response.text)))
+    assert response.headers["content-type"].startswith("text/csv")
+    assert len(rows) == 5
+    
+    response = await client.get("/api/v1/tasks/export/json", params=auth)
+    assert sorted(t["title"] for t in response.json()) == [f"task {i}" for i in range(5)]
+    
+    response = await client.get("/api/v1/tasks/export/ndjson", params=auth)
+    lines = response.text.splitlines()
+    assert len(lines) == 5
+    assert json.loads(lines[0])["title"] == "task 4"
+    
+    response = await client.get("/api/v1/tasks/export/xml", params=auth)
+    assert response.status_code == 400
+
+
+@pytest.mark.asyncio
+async def test_import_round_trips_export_and_reports_row_errors(client: AsyncClient, auth):
+    """Test bulk import accepts export output and reports invalid rows"""
+    body = "\n".join([
+        '{"title": "first", "priority": "high"}',
+        '{"title": ""}',
+        "not json",
+        '{"title": "second", "completed": true, "due_date": "2026-05-01T09:00:00"}',
+    ])
+    response = await client.post(
+        "/api/v1/tasks/import", params={**auth, "format": "ndjson", "batch_size": 1},
+        content=body,
+    )
+    data = response.json()
+    assert data["imported"] == 2
+    assert [e["row"] for e in data["errors"]] == [2, 3]
+    
+    export = await client.get("/api/v1/tasks/export/csv", params=auth)
+    response = await client.post(
+        "/api/v1/tasks/import", params={**auth, "format": "csv"}, content=export.text
+    )
+    assert response.json() == {"success": True, "imported": 2, "failed": 0, "errors": []}
+    
+    response = await client.get("/api/v1/stats/summary", params=auth)
+    stats = response.json()["data"]
+    assert stats["total_tasks"] == 4
+    assert stats["completed_tasks"] == 2
+    assert stats["high_priority_pending"] == 2
+
+
+@pytest.mark.asyncio
+async def test_import_rejects_oversized_and_malformed_bodies(client: AsyncClient, auth, monkeypatch):
+    """Test import enforces the size cap while reading and rejects broken CSV"""
+    from src.config import settings
+    
+    
+    monkeypatch.setattr(settings, "IMPORT_MAX_BYTES", 64)
+    response = await client.post(
+        "/api/v1/tasks/import", params={**auth, "format": "ndjson"},
+        content='{"title": "x"}\n' * 10,
+    )
+    assert response.status_code == 413
+    
+    async def chunks():
+        for _ in range(10):
+            yield b'{"title": "x"}\n'
+    
+    response = await client.post(
+        "/api/v1/tasks/import", params={**auth, "format": "ndjson"}, content=chunks()
+    )
+    assert response.status_code == 413
+    
+    monkeypatch.undo()
+    response = await client.post(
+        "/api/v1/tasks/import", params={**auth, "format": "csv"},
+        content="title\n" + "x" * 200000,
+    )
+    assert response.status_code == 400
+
+
+@pytest.mark.asyncio
+async def test_batch_operations(client: AsyncClient, auth):
+    """Test batch complete/update/delete report per-id results"""
+    from uuid import uuid4
+    
+    ids = []
+    for i in range(3):
+        response = await client.post("/api/v1/tasks", params=auth, json={"title": f"t{i}"})
+        ids.append(response.json()["task"]["id"])
+    missing = str(uuid4())
+    
+    response = await client.post("/api/v1/tasks/batch", params=auth, json={"operations": [
+        {"op": "complete", "ids": [ids[0], ids[1], missing]},
+        {"op": "complete", "ids": [ids[0]]},
+        {"op": "update", "ids": [ids[2]], "fields": {"priority": "high"}},
+        {"op": "delete", "ids": [ids[1]]},
+    ]})
+    results = [r["results"] for r in response.json()["results"]]
+    assert results[0] == {ids[0]: "completed", ids[1]: "completed", missing: "not_found"}
+    assert results[1] == {ids[0]: "unchanged"}
+    assert results[2] == {ids[2]: "updated"}
+    assert results[3] == {ids[1]: "deleted"}
+    
+    stats = (await client.get("/api/v1/stats/summary", params=auth)).json()["data"]
+    assert stats["total_tasks"] == 2
+    assert stats["completed_tasks"] == 1
+    assert stats["high_priority_pending"] == 1
+    
+    task = (await client.get(f"/api/v1/tasks/{ids[0]}", params=auth)).json()["task"]
+    assert task["completed"] is True
+
+
+@pytest.mark.asyncio
+async def test_patch_and_complete_update_in_place(client: AsyncClient, auth):
+    """Test PATCH and complete return the updated row and keep counters right"""
+    task_id = (await client.post("/api/v1/tasks", params=auth, json={"title": "old"})).json()["task"]["id"]
+    
+    response = await client.patch(
+        f"/api/v1/tasks/{task_id}", params=auth, json={"title": "new", "priority": "high"}
+    )
+    task = response.json()["task"]
+    assert (task["title"], task["priority"]) == ("new", "high")
+    stats = (await client.get("/api/v1/stats/summary", params=auth)).json()["data"]
+    assert stats["high_priority_pending"] == 1
+    
+    response = await client.patch(f"/api/v1/tasks/{task_id}/complete", params=auth)
+    task = response.json()["task"]
+    assert task["completed"] is True
+    assert task["completed_at"] is not None
+    stats = (await client.get("/api/v1/stats/summary", params=auth)).json()["data"]
+    assert (stats["completed_tasks"], stats["high_priority_pending"]) == (1, 0)
+    
+    response = await client.patch(f"/api/v1/tasks/{uuid4()}", params=auth, json={"title": "x"})
+    assert response.status_code == 404
+
+
+@pytest.mark.asyncio
+async def test_etags_and_conditional_requests(client: AsyncClient, auth):
+    """Test ETags, If-None-Match 304s and If-Match 412s on tasks"""
+    task_id = (await client.post("/api/v1/tasks", params=auth, json={"title": "v1"})).json()["task"]["id"]
+    
+    response = await client.get(f"/api/v1/tasks/{task_id}", params=auth)
+    etag = response.headers["etag"]
+    assert etag == '"1"'
+    response = await client.get(
+        f"/api/v1/tasks/{task_id}", params=auth, headers={"If-None-Match": etag}
+    )
+    assert response.status_code == 304
+    
+    listing = await client.get("/api/v1/tasks", params=auth)
+    response = await client.get(
+        "/api/v1/tasks", params=auth, headers={"If-None-Match": listing.headers["etag"]}
+    )
+    assert response.status_code == 304
+    
+    response = await client.patch(
+        f"/api/v1/tasks/{task_id}", params=auth, json={"title": "v2"}, headers={"If-Match": etag}
+    )
+    assert response.status_code == 200
+    assert response.headers["etag"] == '"2"'
+    
+    response = await client.patch(
+        f"/api/v1/tasks/{task_id}", params=auth, json={"title": "v3"}, headers={"If-Match": etag}
+    )
+    assert response.status_code == 412
+    
+    # If-Match is a strong comparison, so weak tags never match
+    response = await client.patch(
+        f"/api/v1/tasks/{task_id}", params=auth, json={"title": "v3"}, headers={"If-Match": 'W/"2"'}
+    )
+    assert response.status_code == 412
+    
+    # Any listed strong tag may match
+    response = await client.patch(
+        f"/api/v1/tasks/{task_id}", params=auth, json={"title": "v3"},
+        headers={"If-Match": '"1", W/"3", "2"'},
+    )
+    assert response.status_code == 200
+    assert response.headers["etag"] == '"3"'
+    response = await client.patch(
+        f"/api/v1/tasks/{task_id}/complete", params=auth, headers={"If-Match": '"1", "2"'}
+    )
+    assert response.status_code == 412
+    
+    response = await client.get(
+        "/api/v1/tasks", params=auth, headers={"If-None-Match": listing.headers["etag"]}
+    )
+    assert response.status_code == 200
+    assert response.json()["data"][0]["title"] == "v3"
+
+
+@pytest.mark.asyncio
+async def test_changes_since_watermark(client: AsyncClient, auth, monkeypatch):
+    """Test delta sync returns only tasks changed after the watermark"""
+    from src.config import settings
+    
+    monkeypatch.setattr(settings, "SYNC_SAFETY_WINDOW_SECONDS", 0)
+    ids = []
+    for i in range(3):
+        response = await client.post("/api/v1/tasks", params=auth, json={"title": f"t{i}"})
+        ids.append(response.json()["task"]["id"])
+    
+    first = (await client.get("/api/v1/tasks/changes", params={**auth, "limit": 2})).json()
+    assert first["has_more"] is True
+    rest = (await client.get(
+        "/api/v1/tasks/changes", params={**auth, "since": first["next_since"]}
+    )).json()
+    assert [t["id"] for t in first["updated"] + rest["updated"]] == ids
+    assert rest["has_more"] is False
+    
+    await client.patch(f"/api/v1/tasks/{ids[0]}", params=auth, json={"title": "edited"})
+    await client.delete(f"/api/v1/tasks/{ids[1]}", params=auth)
+    delta = (await client.get(
+        "/api/v1/tasks/changes", params={**auth, "since": rest["next_since"]}
+    )).json()
+    assert [t["title"] for t in delta["updated"]] == ["edited"]
+    assert delta["deleted"] == [ids[1]]
+
+
+@pytest.mark.asyncio
+async def test_presence_batch_lookup(client: AsyncClient, auth):
+    """Test presence for several users comes back from one request"""
+    from src.api.v1.ws import manager
+    
+    online, unknown = uuid4(), uuid4()
+    manager.presence.touch(online)
+    
+    response = await client.get(
+        "/api/v1/presence", params={**auth, "user_ids": f"{online},{unknown}"}
+    )
+    assert response.status_code == 200
+    presence = response.json()["presence"]
+    assert [(p["id"], p["status"]) for p in presence] == [
+        (str(online), "online"), (str(unknown), "offline"),
+    ]
+    assert presence[1]["last_seen"] is None
+    
+    response = await client.get("/api/v1/presence", params={**auth, "user_ids": "nope"})
+    assert response.status_code == 400
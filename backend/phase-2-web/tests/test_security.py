@@ -25,3 +25,23 @@ class TestSecurity:
         wrong_password = "WrongPassword456"
         hashed = hash_password(password)
         assert not verify_password(wrong_password, hashed)
+    
+    @pytest.mark.asyncio
+    async def test_password_hashing_off_event_loop(self):
+        """Test async hashing runs on the pool and reports its usage"""
+        import asyncio
+        from src.security import (
+            hash_password_async, verify_password_async, get_password_hash_stats
+        )
+        
+        before = get_password_hash_stats()["completed"]
+        hashed = await hash_password_async("TestPassword123")
+        results = await asyncio.gather(
+            verify_password_async("TestPassword123", hashed),
+            verify_password_async("WrongPassword456", hashed),
+        )
+        
+        assert results == [True, False]
+        stats = get_password_hash_stats()
+        assert stats["completed"] == before + 3
+        assert stats["running"] == 0
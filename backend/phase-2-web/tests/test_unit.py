@@ -1,3 +1,5 @@
+import asyncio
+
 import pytest
 
 
@@ -23,3 +25,905 @@ def test_config():
     assert settings.JWT_ALGORITHM == "HS256"
     assert settings.JWT_EXPIRY == 86400  # 24 hours
     assert settings.JWT_REFRESH_EXPIRY == 2592000  # 30 days
+
+
+@pytest.mark.asyncio
+async def test_list_tasks_page_cursor(async_session_local):
+    """Test keyset pagination walks every task exactly once"""
+    from datetime import datetime, timedelta
+    from src.models.schemas import User, Task
+    from src.services.auth_service import TaskService
+    
+    async with async_session_local() as session:
+        user = User(email="pager@example.com", name="Pager", password_hash="x")
+        session.add(user)
+        base = datetime(2026, 1, 1)
+        for i in range(7):
+            session.add(Task(user_id=user.id, title=f"t{i}", created_at=base + timedelta(minutes=i)))
+        await session.commit()
+        
+        seen = []
+        cursor = None
+        while True:
+            tasks, cursor = await TaskService.list_tasks_page(
+                user.id, session, limit=3, cursor=cursor
+            )
+            seen.extend(t.title for t in tasks)
+            if cursor is None:
+                break
+        
+        assert seen == [f"t{i}" for i in reversed(range(7))]
+        assert await TaskService.count_tasks(user.id, session) == 7
+        assert await TaskService.count_tasks(user.id, session, estimate=True) == 7
+
+
+@pytest.mark.asyncio
+async def test_get_user_stats_aggregate(async_session_local):
+    """Test user stats are aggregated in SQL"""
+    from datetime import datetime, timedelta
+    from src.models.schemas import User, Task
+    from src.services.auth_service import TaskService
+    
+    async with async_session_local() as session:
+        login = datetime(2026, 1, 2)
+        user = User(email="stats@example.com", name="Stats", password_hash="x", last_login_at=login)
+        session.add(user)
+        past = datetime.utcnow() - timedelta(days=1)
+        session.add(Task(user_id=user.id, title="a", priority="high"))
+        session.add(Task(user_id=user.id, title="b", due_date=past))
+        session.add(Task(user_id=user.id, title="c", completed=True, due_date=past))
+        session.add(Task(user_id=user.id, title="d", deleted_at=past))
+        await session.commit()
+        
+        stats = await TaskService.get_user_stats(user.id, session)
+        
+        assert stats["total_tasks"] == 3
+        assert stats["completed_tasks"] == 1
+        assert stats["pending_tasks"] == 2
+        assert stats["high_priority_pending"] == 1
+        assert stats["overdue_tasks"] == 1
+        assert isinstance(stats["last_task_created"], datetime)
+        assert stats["last_login"] == login
+
+
+@pytest.mark.asyncio
+async def test_get_completion_trends(async_session_local):
+    """Test completion trends are bucketed per day and zero-filled"""
+    from datetime import date, datetime
+    from src.models.schemas import User, Task
+    from src.services.auth_service import TaskService
+    
+    async with async_session_local() as session:
+        user = User(email="trends@example.com", name="Trends", password_hash="x")
+        session.add(user)
+        for completed_at in [datetime(2026, 3, 1, 10), datetime(2026, 3, 1, 23, 30), datetime(2026, 3, 3, 1)]:
+            session.add(Task(user_id=user.id, title="t", completed=True, completed_at=completed_at))
+        await session.commit()
+        
+        utc = await TaskService.get_completion_trends(
+            user.id, date(2026, 3, 1), date(2026, 3, 3), session
+        )
+        shifted = await TaskService.get_completion_trends(
+            user.id, date(2026, 3, 1), date(2026, 3, 3), session, tz_offset_minutes=60
+        )
+        
+        assert [d["completed"] for d in utc] == [2, 0, 1]
+        assert [d["completed"] for d in shifted] == [1, 1, 1]
+        assert utc[0]["date"] == "2026-03-01"
+
+
+@pytest.mark.asyncio
+async def test_user_task_stats_maintained_on_write(async_session_local):
+    """Test counters track task writes and match a full rebuild"""
+    from datetime import datetime, timedelta
+    from src.models.schemas import User
+    from src.services.auth_service import TaskService
+    from src.services.task_stats import TaskStatsService, COUNTER_COLUMNS
+    from src.models.schemas import UserTaskStats
+    
+    async with async_session_local() as session:
+        user = User(email="counters@example.com", name="Counters", password_hash="x")
+        session.add(user)
+        await session.commit()
+        
+        due = datetime.utcnow() + timedelta(days=1)
+        a = await TaskService.create_task(user.id, "a", None, "high", due, session)
+        b = await TaskService.create_task(user.id, "b", None, "low", None, session)
+        c = await TaskService.create_task(user.id, "c", None, "medium", None, session)
+        await TaskService.complete_task(a.id, user.id, session)
+        await TaskService.delete_task(b.id, user.id, session)
+        
+        stats = await TaskStatsService.get(user.id, session)
+        incremental = {column: getattr(stats, column) for column in COUNTER_COLUMNS}
+        assert incremental["total"] == 2
+        assert incremental["completed"] == 1
+        assert incremental["pending_high"] == 0
+        assert incremental["pending_medium"] == 1
+        assert incremental["pending_with_due"] == 0
+        assert stats.last_task_created == c.created_at
+        
+        await TaskStatsService.rebuild(session, user.id)
+        await session.commit()
+        stats = await session.get(UserTaskStats, user.id, populate_existing=True)
+        assert {column: getattr(stats, column) for column in COUNTER_COLUMNS} == incremental
+        
+        # Rebuilds upsert over existing rows; a full rebuild drops users with no tasks
+        await TaskService.delete_task(a.id, user.id, session)
+        await TaskService.delete_task(c.id, user.id, session)
+        await TaskStatsService.rebuild(session, user.id)
+        await TaskStatsService.rebuild(session, user.id)
+        stats = await session.get(UserTaskStats, user.id, populate_existing=True)
+        assert stats.total == 0 and stats.completed == 0
+        await TaskStatsService.rebuild(session)
+        await session.commit()
+        assert await session.get(UserTaskStats, user.id, populate_existing=True) is None
+
+
+def test_principal_cache_bounds_and_expiry():
+    """Test principal cache evicts least recently used and expired entries"""
+    import time
+    from src.models.schemas import User
+    from src.principal_cache import PrincipalCache
+    
+    cache = PrincipalCache(max_size=2, ttl=60)
+    user = User(email="p@example.com", name="Principal", password_hash="x")
+    exp = int(time.time()) + 3600
+    
+    cache.set("a", user, exp)
+    cache.set("b", user, exp)
+    assert cache.get("a").id == user.id
+    cache.set("c", user, exp)
+    assert cache.get("b") is None
+    assert cache.get("a") is not None
+    
+    cache.set("expired", user, int(time.time()) - 1)
+    assert cache.get("expired") is None
+    
+    cache.invalidate("a")
+    cache.invalidate("c")
+    assert len(cache) == 0
+
+
+def test_db_pool_options_presets():
+    """Test pool presets follow ENV with explicit overrides applied"""
+    from src.config import Settings
+    from src.db import build_db_url
+    
+    production = Settings(ENV="production", DB_POOL_SIZE=50)
+    assert production.db_pool_options()["pool_size"] == 50
+    assert production.db_pool_options()["pool_timeout"] == 5
+    assert Settings(ENV="unknown").db_pool_options()["pool_size"] == 5
+    
+    assert build_db_url("postgresql://u:p@h/db") == "postgresql+asyncpg://u:p@h/db"
+    assert build_db_url("sqlite:///./dev.db") == "sqlite+aiosqlite:///./dev.db"
+    with pytest.raises(ValueError):
+        build_db_url("mysql://u:p@h/db")
+
+
+@pytest.mark.asyncio
+async def test_pool_stats_endpoint(client):
+    """Test pool statistics are exposed for monitoring"""
+    response = await client.get("/api/v1/health/pools")
+    data = response.json()
+    assert response.status_code == 200
+    assert data["database"]["pool"] == "TimedQueuePool"
+    assert data["database"]["checked_out"] == 0
+    assert "queue_depth" in data["password_hash"]
+    assert "replica" not in data["database"]
+
+
+def test_pool_stats_include_replica(monkeypatch):
+    """Test a configured read replica's pool is reported alongside the primary"""
+    from sqlalchemy.ext.asyncio import create_async_engine
+    from src import db
+    
+    replica = create_async_engine(
+        "postgresql+asyncpg://u:p@replica/db", **db.engine_options("postgresql+asyncpg://")
+    )
+    monkeypatch.setattr(db, "read_engine", replica)
+    stats = db.get_pool_stats()
+    assert stats["replica"]["pool"] == "TimedQueuePool"
+    assert stats["replica"]["checked_out"] == 0
+    assert stats["replica"]["wait"]["checkouts"] == 0
+
+
+@pytest.mark.asyncio
+async def test_commit_with_writes_pins_user_to_primary(async_session_local):
+    """Test read-your-writes pinning after a user's write commits"""
+    from src.db import is_pinned_to_primary
+    from src.models.schemas import User
+    
+    async with async_session_local() as session:
+        user = User(email="pinned@example.com", name="Pinned", password_hash="x")
+        session.info["user_id"] = user.id
+        await session.commit()
+        assert not is_pinned_to_primary(user.id)
+        
+        session.add(user)
+        await session.commit()
+        assert is_pinned_to_primary(user.id)
+
+
+@pytest.mark.asyncio
+async def test_hot_task_queries_use_indexes(async_engine, async_session_local):
+    """Test EXPLAIN shows each hot task query using its composite index"""
+    from datetime import date, datetime
+    from sqlalchemy import event
+    from src.models.schemas import User, Task
+    from src.services.auth_service import TaskService
+    
+    statements = []
+    
+    def capture(conn, cursor, statement, parameters, context, executemany):
+        if statement.lstrip().upper().startswith("SELECT") and "FROM tasks" in statement:
+            statements.append((statement, parameters))
+    
+    async with async_session_local() as session:
+        user = User(email="explain@example.com", name="Explain", password_hash="x")
+        session.add(user)
+        session.add(Task(user_id=user.id, title="t", due_date=datetime(2020, 1, 1)))
+        await session.commit()
+        
+        # index name -> (service call, marker identifying its query)
+        queries = {
+            "ix_tasks_user_active_created": (
+                TaskService.list_tasks_page(user.id, session), "ORDER BY tasks.created_at DESC"
+            ),
+            "ix_tasks_user_active_completed_at": (
+                TaskService.get_completion_trends(
+                    user.id, date(2026, 1, 1), date(2026, 1, 7), session
+                ),
+                "GROUP BY",
+            ),
+            "ix_tasks_user_pending_due": (
+                TaskService.get_user_stats(user.id, session), "tasks.due_date <"
+            ),
+            "ix_tasks_user_updated_id": (
+                TaskService.list_changes(user.id, session), "ORDER BY tasks.updated_at"
+            ),
+        }
+        
+        sync_engine = async_engine.sync_engine
+        event.listen(sync_engine, "before_cursor_execute", capture)
+        try:
+            for _, (query, _) in queries.items():
+                await query
+        finally:
+            event.remove(sync_engine, "before_cursor_execute", capture)
+        
+        connection = await session.connection()
+        for index, (_, marker) in queries.items():
+            statement, parameters = next(s for s in statements if marker in s[0])
+            result = await connection.exec_driver_sql(f"EXPLAIN QUERY PLAN {statement}", parameters)
+            plan = " ".join(str(row[-1]) for row in result.all())
+            assert index in plan, plan
+
+
+def test_migrations_match_models(tmp_path):
+    """Test alembic upgrade builds the models' schema and downgrades cleanly"""
+    from alembic import command
+    from alembic.config import Config
+    
+    config = Config("alembic.ini")
+    config.set_main_option("sqlalchemy.url", f"sqlite+aiosqlite:///{tmp_path / 'migrations.db'}")
+    
+    command.upgrade(config, "head")
+    command.check(config)  # raises if the models drifted from the migrations
+    command.downgrade(config, "base")
+    command.upgrade(config, "head")
+
+
+class FakeWebSocket:
+    """Minimal stand-in for a starlette WebSocket"""
+    
+    def __init__(self, fail=False, stalled=False):
+        self.sent = []
+        self.fail = fail
+        self.stalled = stalled
+        self.close_code = None
+    
+    async def accept(self):
+        pass
+    
+    async def send_text(self, text):
+        if self.fail:
+            raise RuntimeError("connection closed")
+        if self.stalled:
+            await asyncio.Event().wait()
+        self.sent.append(text)
+    
+    async def close(self, code=1000):
+        self.close_code = code
+
+
+async def settle():
+    """Let writer and eviction tasks run"""
+    for _ in range(5):
+        await asyncio.sleep(0)
+
+
+@pytest.mark.asyncio
+async def test_task_updates_reach_only_interested_sockets():
+    """Test fan-out goes to the owner's sockets, narrowed by subscriptions"""
+    import json
+    from uuid import uuid4
+    from src.api.v1.ws import ConnectionManager
+    
+    manager = ConnectionManager()
+    owner, stranger = uuid4(), uuid4()
+    task_id, other_task = uuid4(), uuid4()
+    plain, focused, unsubscribed, outsider = (FakeWebSocket() for _ in range(4))
+    broken = FakeWebSocket(fail=True)
+    for socket in (plain, focused, unsubscribed, broken):
+        await manager.connect(owner, socket)
+    await manager.connect(stranger, outsider)
+    manager.subscribe(focused, task_id)
+    manager.subscribe(unsubscribed, task_id)
+    manager.unsubscribe(unsubscribed, task_id)
+    
+    await manager.broadcast_task_update(task_id, "updated", {"title": "x"}, user_id=owner)
+    await manager.broadcast_task_update(other_task, "updated", {"title": "y"}, user_id=owner)
+    await settle()
+    
+    assert [len(s.sent) for s in (plain, focused, unsubscribed, outsider)] == [2, 1, 0, 0]
+    assert json.loads(focused.sent[0])["task_id"] == str(task_id)
+    # One encoded payload is shared by every recipient
+    assert plain.sent[0] is focused.sent[0]
+    
+    await manager.disconnect(owner, focused)
+    assert task_id not in manager.task_subscribers
+    assert focused not in manager._socket_tasks
+    # The socket whose send failed was dropped
+    assert broken.close_code == 1013
+    assert broken not in manager.active_connections[owner]
+
+
+@pytest.mark.asyncio
+async def test_send_queue_coalesces_and_evicts_slow_consumers(monkeypatch):
+    """Test a stalled socket's queue stays bounded and the socket is evicted"""
+    import json
+    from uuid import uuid4
+    from src.api.v1 import ws
+    
+    manager = ws.ConnectionManager()
+    user_id = uuid4()
+    fast, stalled = FakeWebSocket(), FakeWebSocket(stalled=True)
+    await manager.connect(user_id, fast)
+    await manager.connect(user_id, stalled)
+    queue = manager._queues[stalled]
+    queue.max_size = 3
+    
+    task_ids = [uuid4() for _ in range(4)]
+    await manager.broadcast_task_update(task_ids[0], "updated", {"n": 0}, user_id=user_id)
+    await settle()  # the stalled writer now holds the first message
+    for n in range(1, 4):
+        await manager.broadcast_task_update(task_ids[1], "updated", {"n": n}, user_id=user_id)
+    await settle()
+    # Repeated updates to one task collapse to the latest
+    assert len(queue) == 1
+    assert json.loads(next(iter(queue._pending.values())))["data"] == {"n": 3}
+    assert [json.loads(m)["data"] for m in fast.sent] == [{"n": 0}, {"n": 3}]
+    
+    for task_id in task_ids[2:]:
+        await manager.broadcast_task_update(task_id, "updated", {}, user_id=user_id)
+    await manager.broadcast_task_update(uuid4(), "updated", {}, user_id=user_id)
+    assert len(queue) == 3 and queue.dropped == 1
+    
+    # Still full after the grace period: evicted and closed
+    monkeypatch.setattr(queue, "evict_after", 0)
+    await manager.broadcast_task_update(uuid4(), "updated", {}, user_id=user_id)
+    await settle()
+    assert stalled.close_code == 1013
+    assert manager.active_connections[user_id] == {fast}
+    assert stalled not in manager._queues
+
+
+@pytest.mark.asyncio
+async def test_backplane_fans_out_across_workers():
+    """Test an update published on one worker reaches sockets on another"""
+    import json
+    from uuid import uuid4
+    from src.api.v1.ws import ConnectionManager
+    from src.api.v1.ws.backplane import LocalBackplane
+    
+    peers = []
+    worker_a = ConnectionManager(LocalBackplane(peers))
+    worker_b = ConnectionManager(LocalBackplane(peers))
+    user_id, other_user, task_id = uuid4(), uuid4(), uuid4()
+    on_a, on_b, other = FakeWebSocket(), FakeWebSocket(), FakeWebSocket()
+    await worker_a.connect(user_id, on_a)
+    await worker_b.connect(user_id, on_b)
+    await worker_b.connect(other_user, other)
+    
+    await worker_a.broadcast_task_update(task_id, "updated", {"title": "x"}, user_id=user_id)
+    await worker_a.send_notification(user_id, {"text": "hi"})
+    await settle()
+    
+    for socket in (on_a, on_b):
+        assert [json.loads(m)["type"] for m in socket.sent] == ["task_update", "notification"]
+    # Both workers send the same published payload
+    assert on_a.sent == on_b.sent
+    assert other.sent == []
+    
+    await worker_b.stop()
+    await worker_a.broadcast_task_update(task_id, "deleted", {}, user_id=user_id)
+    await settle()
+    assert len(on_a.sent) == 3 and len(on_b.sent) == 2
+
+
+@pytest.mark.asyncio
+async def test_task_mutations_dispatch_through_outbox(async_session_local):
+    """Test task writes queue outbox events that the dispatcher delivers"""
+    import json
+    from sqlalchemy import select, func
+    from src.models.schemas import User, TaskEvent, TaskBatchOperation
+    from src.services.auth_service import TaskService
+    from src.services.outbox import OutboxDispatcher
+    
+    published = []
+    
+    async def publish(task_event):
+        published.append((task_event.action, json.loads(task_event.payload)))
+    
+    dispatcher = OutboxDispatcher(async_session_local, publish, batch_size=10)
+    
+    async with async_session_local() as session:
+        user = User(email="outbox@example.com", name="Outbox", password_hash="x")
+        session.add(user)
+        await session.commit()
+        
+        task = await TaskService.create_task(user.id, "Ship", None, "high", None, session)
+        await TaskService.update_task(task.id, user.id, session, title="Ship it")
+        await TaskService.complete_task(task.id, user.id, session)
+        other = await TaskService.create_task(user.id, "Other", None, "low", None, session)
+        await TaskService.batch_mutate(
+            user.id, [TaskBatchOperation(op="update", ids=[other.id], fields={"priority": "high"})],
+            session,
+        )
+        await TaskService.batch_mutate(
+            user.id, [TaskBatchOperation(op="delete", ids=[task.id, other.id])], session
+        )
+        assert await session.scalar(select(func.count()).select_from(TaskEvent)) == 7
+    
+    assert await dispatcher.dispatch_once() == 7
+    assert await dispatcher.dispatch_once() == 0
+    assert [action for action, _ in published] == [
+        "created", "updated", "completed", "created", "updated", "deleted", "deleted",
+    ]
+    assert published[1][1]["title"] == "Ship it"
+    assert published[2][1]["completed"] is True
+    # Batch writes carry the full row like every other write path
+    assert published[4][1]["title"] == "Other"
+    assert published[4][1]["priority"] == "high" and published[4][1]["version"] == 2
+
+
+@pytest.mark.asyncio
+async def test_outbox_failed_event_backs_off_and_dead_letters(async_session_local):
+    """Test one failing event neither blocks later events nor retries forever"""
+    from datetime import datetime, timedelta
+    from sqlalchemy import select, update
+    from src.models.schemas import User, TaskEvent
+    from src.services.auth_service import TaskService
+    from src.services.outbox import OutboxDispatcher
+    
+    published = []
+    
+    async def publish(task_event):
+        if task_event.action == "created" and not published:
+            raise RuntimeError("backplane down")
+        published.append(task_event.id)
+    
+    dispatcher = OutboxDispatcher(async_session_local, publish, batch_size=10, max_attempts=2)
+    
+    async with async_session_local() as session:
+        user = User(email="deadletter@example.com", name="Dead", password_hash="x")
+        session.add(user)
+        await session.commit()
+        task = await TaskService.create_task(user.id, "Poison", None, "low", None, session)
+        await TaskService.delete_task(task.id, user.id, session)
+    
+    async def fail_every_time(task_event):
+        raise RuntimeError("still down")
+    
+    assert await dispatcher.dispatch_once() == 2
+    assert len(published) == 1  # the later event went through
+    assert await dispatcher.dispatch_once() == 0  # the failure is backing off
+    
+    async with async_session_local() as session:
+        await session.execute(update(TaskEvent).values(next_attempt_at=None))
+        await session.commit()
+    dispatcher.publish = fail_every_time
+    assert await dispatcher.dispatch_once() == 1
+    assert await dispatcher.dispatch_once() == 0
+    
+    async with async_session_local() as session:
+        dead = (await session.execute(select(TaskEvent))).scalars().all()
+        assert [(e.action, e.attempts, e.dead_at is not None) for e in dead] == [
+            ("created", 2, True),
+        ]
+        
+        # Dead events are kept for the retention period, then purged
+        assert await dispatcher.purge_dead() == 0
+        await session.execute(update(TaskEvent).values(dead_at=datetime.utcnow() - timedelta(days=30)))
+        await session.commit()
+    assert await dispatcher.purge_dead() == 1
+
+
+def test_presence_store_expiry_and_bounds(monkeypatch):
+    """Test presence entries expire, stay bounded and report transitions once"""
+    import time
+    from uuid import uuid4
+    from src.api.v1.ws.presence import PresenceStore
+    
+    clock = [1000.0]
+    monkeypatch.setattr(time, "monotonic", lambda: clock[0])
+    store = PresenceStore(ttl=60, max_entries=2)
+    a, b, c = uuid4(), uuid4(), uuid4()
+    
+    store.touch(a)
+    store.touch(a)
+    store.touch(b)
+    assert [(x["id"], x["status"]) for x in store.drain_changes()] == [
+        (str(a), "online"), (str(b), "online"),
+    ]
+    assert store.drain_changes() == []
+    
+    # Capacity evicts the least recently seen user, reported offline
+    store.touch(c)
+    assert len(store) == 2
+    assert {(x["id"], x["status"]) for x in store.drain_changes()} == {
+        (str(a), "offline"), (str(c), "online"),
+    }
+    
+    clock[0] += 30
+    store.touch(c)
+    clock[0] += 31
+    assert store.sweep() == 1  # b expired, c heartbeated in time
+    assert [x["id"] for x in store.drain_changes()] == [str(b)]
+    assert [x["status"] for x in store.get([b, c])] == ["offline", "online"]
+
+
+def test_presence_store_refreshes_and_expires_remote_entries(monkeypatch):
+    """Test local users are re-announced and remote entries lapse by TTL"""
+    import time
+    from datetime import datetime
+    from uuid import uuid4
+    from src.api.v1.ws.presence import PresenceStore
+    
+    clock = [1000.0]
+    monkeypatch.setattr(time, "monotonic", lambda: clock[0])
+    monkeypatch.setattr(time, "time", lambda: clock[0] + 1_700_000_000)
+    store = PresenceStore(ttl=60, max_entries=10)
+    local, remote = uuid4(), uuid4()
+    
+    store.touch(local)
+    assert len(store.drain_changes()) == 1
+    clock[0] += 20
+    store.touch(local)
+    assert store.drain_refreshes() == []
+    clock[0] += 15
+    store.touch(local)
+    assert [x["id"] for x in store.drain_refreshes()] == [str(local)]
+    assert store.drain_changes() == []
+    
+    last_seen = datetime.utcfromtimestamp(time.time() - 10)
+    assert store.apply(remote, True, last_seen) is True
+    assert store.apply(remote, True, last_seen) is False
+    assert store.get([remote])[0]["status"] == "online"
+    
+    # Not refreshed by its worker: it lapses 60s after its last_seen
+    clock[0] += 45
+    store.touch(local)
+    assert store.sweep() == 0
+    clock[0] += 6
+    assert store.sweep() == 1
+    assert [(x["id"], x["status"]) for x in store.drain_lapsed()] == [(str(remote), "offline")]
+    assert store.drain_changes() == []  # other workers' users are not republished
+    assert store.get([remote, local])[0]["status"] == "offline"
+
+
+@pytest.mark.asyncio
+async def test_presence_deltas_reach_watchers_on_other_workers():
+    """Test presence transitions are batched to watching sockets"""
+    import json
+    from uuid import uuid4
+    from src.api.v1.ws import ConnectionManager
+    from src.api.v1.ws.backplane import LocalBackplane
+    
+    peers = []
+    worker_a = ConnectionManager(LocalBackplane(peers))
+    worker_b = ConnectionManager(LocalBackplane(peers))
+    watcher, alice, bob = uuid4(), uuid4(), uuid4()
+    socket = FakeWebSocket()
+    await worker_b.connect(watcher, socket)
+    worker_b.watch_presence(socket, [alice])
+    
+    alice_socket = FakeWebSocket()
+    await worker_a.connect(alice, alice_socket)
+    await worker_a.connect(bob, FakeWebSocket())
+    await worker_a.broadcast_presence()
+    await settle()
+    
+    messages = [json.loads(m) for m in socket.sent]
+    assert len(messages) == 1
+    assert [(c["id"], c["status"]) for c in messages[0]["changes"]] == [(str(alice), "online")]
+    # Worker B learned about A's users from the delta
+    assert worker_b.presence.get([alice])[0]["status"] == "online"
+    
+    await worker_a.disconnect(alice, alice_socket)
+    await worker_a.broadcast_presence()
+    await worker_a.broadcast_presence()  # nothing new, nothing sent
+    await settle()
+    assert [json.loads(m)["changes"][0]["status"] for m in socket.sent] == ["online", "offline"]
+    assert worker_b.presence.get([alice])[0]["status"] == "offline"
+    
+    await worker_b.disconnect(watcher, socket)
+    assert worker_b.presence_watchers == {}
+
+
+@pytest.mark.asyncio
+async def test_large_presence_delta_fits_notify_limit_and_survives_failures():
+    """Test presence deltas are split under NOTIFY's limit and requeued on error"""
+    import json
+    from uuid import uuid4
+    from src.api.v1.ws import ConnectionManager
+    from src.api.v1.ws.backplane import LocalBackplane, NOTIFY_MAX_BYTES
+    
+    class NotifyBackplane(LocalBackplane):
+        """LocalBackplane with PostgresBackplane's payload check"""
+        max_payload_bytes = NOTIFY_MAX_BYTES
+        down = False
+        
+        async def publish(self, event):
+            if len(json.dumps(event).encode()) > NOTIFY_MAX_BYTES:
+                raise ValueError("payload string too long")
+            if self.down:
+                raise RuntimeError("Realtime backplane is not connected")
+            sizes.append(len(event["changes"]) + len(event["refreshes"]))
+            await super().publish(event)
+    
+    sizes = []
+    peers = []
+    worker_a = ConnectionManager(NotifyBackplane(peers))
+    worker_b = ConnectionManager(LocalBackplane(peers))
+    users = [uuid4() for _ in range(300)]
+    for user_id in users[:200]:
+        await worker_a.connect(user_id, FakeWebSocket())
+    
+    worker_a.backplane.down = True
+    with pytest.raises(RuntimeError):
+        await worker_a.broadcast_presence()
+    worker_a.backplane.down = False
+    for user_id in users[200:]:
+        await worker_a.connect(user_id, FakeWebSocket())
+    await worker_a.broadcast_presence()
+    
+    assert len(sizes) > 1 and sum(sizes) == 300
+    assert {p["status"] for p in worker_b.presence.get(users)} == {"online"}
+
+
+def test_migrations_backfill_existing_data(tmp_path):
+    """Test upgrading a baseline database backfills stats, jti and versions"""
+    import sqlite3
+    from uuid import uuid4
+    from alembic import command
+    from alembic.config import Config
+    from jose import jwt
+    
+    path = tmp_path / "baseline.db"
+    config = Config("alembic.ini")
+    config.set_main_option("sqlalchemy.url", f"sqlite+aiosqlite:///{path}")
+    command.upgrade(config, "0001")
+    
+    user_id, jti = uuid4().hex, str(uuid4())
+    token = jwt.encode({"jti": jti}, "secret", algorithm="HS256")
+    refresh = jwt.encode({"jti": str(uuid4())}, "secret", algorithm="HS256")
+    now = "2026-01-01 00:00:00.000000"
+    with sqlite3.connect(path) as db:
+        db.execute(
+            "INSERT INTO users (id, email, name, password_hash, is_active, is_verified,"
+            " created_at, updated_at) VALUES (?, 'm@example.com', 'Mig', 'x', 1, 0, ?, ?)",
+            (user_id, now, now),
+        )
+        for i, (priority, completed) in enumerate([("high", 0), ("high", 1), ("low", 0)]):
+            db.execute(
+                "INSERT INTO tasks (id, user_id, title, description, priority, completed,"
+                " created_at, updated_at) VALUES (?, ?, ?, 'searchable text', ?, ?, ?, ?)",
+                (uuid4().hex, user_id, f"task {i}", priority, completed, now, now),
+            )
+        # The second session repeats the access jti and has an unreadable refresh token
+        for access, refresh_token in ((token, refresh), (token, "garbage")):
+            db.execute(
+                "INSERT INTO sessions (id, user_id, access_token, refresh_token, token_type,"
+                " expires_at, created_at, updated_at) VALUES (?, ?, ?, ?, 'Bearer', ?, ?, ?)",
+                (uuid4().hex, user_id, access, refresh_token, now, now, now),
+            )
+    
+    command.upgrade(config, "head")
+    
+    with sqlite3.connect(path) as db:
+        stats = db.execute(
+            "SELECT total, completed, high, pending_high, pending_low FROM user_task_stats"
+        ).fetchall()
+        assert stats == [(3, 1, 2, 1, 1)]
+        assert db.execute("SELECT DISTINCT version FROM tasks").fetchall() == [(1,)]
+        sessions = db.execute(
+            "SELECT access_jti, revoked_at IS NOT NULL FROM sessions ORDER BY revoked_at IS NOT NULL"
+        ).fetchall()
+        assert sessions[0] == (jti, 0)
+        assert sessions[1][0] != jti and sessions[1][1] == 1
+        assert db.execute(
+            "SELECT count(*) FROM tasks_fts WHERE tasks_fts MATCH 'searchable'"
+        ).fetchone() == (3,)
+
+
+@pytest.mark.asyncio
+async def test_ws_task_access_check_uses_short_session(async_session_local):
+    """Test socket authorization checks return their connection to the pool"""
+    from uuid import uuid4
+    from src.api.v1.ws import _check_task_access
+    from src.models.schemas import User, Task
+    
+    async with async_session_local() as session:
+        user = User(email="wsauth@example.com", name="Ws", password_hash="x")
+        task = Task(user_id=user.id, title="mine")
+        session.add_all([user, task])
+        await session.commit()
+    
+    opened = []
+    
+    def session_factory():
+        opened.append(async_session_local())
+        return opened[-1]
+    
+    await _check_task_access(session_factory, task.id, user.id)
+    with pytest.raises(ValueError):
+        await _check_task_access(session_factory, task.id, uuid4())
+    assert len(opened) == 2
+    assert not any(session.in_transaction() for session in opened)
+
+
+@pytest.mark.asyncio
+async def test_ws_backplane_failure_keeps_socket_open(async_session_local, monkeypatch):
+    """Test a failed publish is reported to the client instead of closing it"""
+    import json
+    from starlette.websockets import WebSocketDisconnect
+    from src.api.v1.ws import manager, websocket_endpoint
+    from src.api.v1.ws.backplane import Backplane
+    from src.models.schemas import User, Task
+    from src.security import create_access_token
+    
+    with pytest.raises(TypeError):
+        Backplane()
+    
+    async with async_session_local() as session:
+        user = User(email="wsdown@example.com", name="Down", password_hash="x")
+        task = Task(user_id=user.id, title="mine")
+        session.add_all([user, task])
+        await session.commit()
+    
+    class ScriptedWebSocket(FakeWebSocket):
+        def __init__(self, incoming):
+            super().__init__()
+            self.incoming = incoming
+        
+        async def receive_json(self):
+            await settle()
+            if not self.incoming:
+                raise WebSocketDisconnect()
+            return self.incoming.pop(0)
+    
+    async def publish(event):
+        raise RuntimeError("Realtime backplane is not connected")
+    
+    monkeypatch.setattr(manager.backplane, "publish", publish)
+    socket = ScriptedWebSocket([
+        {"type": "task_status", "task_id": str(task.id), "status": "done"},
+        {"type": "ping"},
+    ])
+    token = create_access_token(user.id, user.email, user.name)
+    await websocket_endpoint(socket, token, session_factory=async_session_local)
+    
+    assert [json.loads(m)["type"] for m in socket.sent] == ["error", "pong"]
+    assert socket.close_code is None
+
+
+@pytest.mark.asyncio
+async def test_send_queue_reads_settings_when_created(monkeypatch):
+    """Test queue limits follow settings at connect time, not import time"""
+    from uuid import uuid4
+    from src.api.v1.ws import ConnectionManager
+    from src.config import settings
+    
+    monkeypatch.setattr(settings, "WS_SEND_QUEUE_SIZE", 3)
+    monkeypatch.setattr(settings, "WS_QUEUE_POLICY", "drop_newest")
+    manager = ConnectionManager()
+    socket = FakeWebSocket()
+    user_id = uuid4()
+    await manager.connect(user_id, socket)
+    
+    queue = manager._queues[socket]
+    assert (queue.max_size, queue.policy) == (3, "drop_newest")
+    assert queue.evict_after == settings.WS_SLOW_CONSUMER_SECONDS
+    await manager.disconnect(user_id, socket)
+
+
+@pytest.mark.asyncio
+async def test_import_failure_part_way_commits_nothing(async_session_local):
+    """Test an import that fails in a later batch leaves no rows or counters"""
+    from sqlalchemy import select, func
+    from src.models.schemas import User, Task, UserTaskStats
+    from src.services.import_service import ImportService
+    
+    async with async_session_local() as session:
+        user = User(email="halfway@example.com", name="Halfway", password_hash="x")
+        session.add(user)
+        await session.commit()
+    
+    body = "\n".join(f'{{"title": "row {i}"}}' for i in range(5)).encode()
+    async with async_session_local() as session:
+        execute = session.execute
+        batches = []
+        
+        async def failing_execute(statement, *args, **kwargs):
+            if args and isinstance(args[0], list):
+                batches.append(args[0])
+                if len(batches) == 2:
+                    raise RuntimeError("connection lost")
+            return await execute(statement, *args, **kwargs)
+        
+        session.execute = failing_execute
+        with pytest.raises(RuntimeError):
+            await ImportService.import_tasks(user.id, "ndjson", body, session, batch_size=2)
+    
+    async with async_session_local() as session:
+        assert await session.scalar(select(func.count()).select_from(Task)) == 0
+        assert await session.get(UserTaskStats, user.id) is None
+
+
+@pytest.mark.asyncio
+async def test_startup_aborts_on_schema_revision_mismatch(monkeypatch):
+    """Test the app refuses to start on an outdated schema"""
+    from src import main
+    from src.db import SchemaVersionError
+    
+    async def outdated():
+        raise SchemaVersionError("Database schema revision is 0008, expected 0010")
+    
+    monkeypatch.setattr(main, "init_db", outdated)
+    with pytest.raises(SchemaVersionError):
+        async with main.lifespan(main.app):
+            pass
+
+
+@pytest.mark.asyncio
+async def test_import_records_outbox_events(async_session_local):
+    """Test imported tasks reach realtime clients through the outbox"""
+    import json
+    from sqlalchemy import select
+    from src.models.schemas import User, TaskEvent
+    from src.services.import_service import ImportService
+    
+    async with async_session_local() as session:
+        user = User(email="imported-events@example.com", name="Events", password_hash="x")
+        session.add(user)
+        await session.commit()
+        
+        body = b'{"title": "one"}\n{"title": ""}\n{"title": "two", "priority": "high"}'
+        result = await ImportService.import_tasks(user.id, "ndjson", body, session, batch_size=1)
+        assert result["imported"] == 2
+        
+        events = (await session.execute(select(TaskEvent).order_by(TaskEvent.id))).scalars().all()
+        assert [e.action for e in events] == ["created", "created"]
+        assert [json.loads(e.payload)["title"] for e in events] == ["one", "two"]
+
+
+def test_outbox_dispatcher_reads_settings_when_created(monkeypatch):
+    """Test dispatcher defaults follow settings at construction, not import"""
+    from src.config import settings
+    from src.services.outbox import OutboxDispatcher
+    
+    monkeypatch.setattr(settings, "OUTBOX_BATCH_SIZE", 7)
+    monkeypatch.setattr(settings, "OUTBOX_MAX_ATTEMPTS", 3)
+    dispatcher = OutboxDispatcher(None, None, poll_interval=5)
+    assert (dispatcher.batch_size, dispatcher.poll_interval, dispatcher.max_attempts) == (7, 5, 3)